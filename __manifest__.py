@@ -63,6 +63,7 @@ Comprehensive financial transaction management system with advanced features:
         'report/report_wizard_view.xml',
         'report/cheque_report.xml',
         'report/advanced_report_template.xml',
+        'report/cheque_report_stream.xml',
         'views/branch_view.xml',
         'views/payment_processor_view.xml',
         'views/cheque_payment.xml',
@@ -71,11 +72,22 @@ Comprehensive financial transaction management system with advanced features:
         'views/ir_sequence_data.xml',
         'views/cheque_manage.xml',
         'views/res_config.xml',
+        'views/res_config_settings.xml',
         'views/account_accountant.xml',
         'views/revert_cheque.xml',
+        'views/revert_cheque_archive.xml',
         'views/res_partner.xml',
         'views/cheque_category.xml',
+        'views/cheque_job.xml',
+        'views/cheque_profile.xml',
+        'views/cheque_forecast.xml',
+        'views/cheque_statement_import.xml',
+        'views/cheque_register_import.xml',
         'data/cron_cheque_notifications.xml',
+        'data/cheque_job_cron.xml',
+        'data/cheque_book_cron.xml',
+        'data/cheque_aging_cron.xml',
+        'data/revert_cheque_cron.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -1,14 +1,20 @@
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
 
 
 class Branch(models.Model):
     _name = 'branch.model'
     _description = 'Branch Management'
+    _parent_store = True
+    _rec_name = 'complete_name'
 
-    name = fields.Char(string='Branch Name', required=True)
-    code = fields.Char(string='Branch Code', required=True)
-    parent_id = fields.Many2one('branch.model', string='Parent Branch')
+    name = fields.Char(string='Branch Name', required=True, index='trigram')
+    code = fields.Char(string='Branch Code', required=True, index='trigram')
+    complete_name = fields.Char(string='Display Name', compute='_compute_complete_name', store=True,
+                                index='trigram')
+    parent_id = fields.Many2one('branch.model', string='Parent Branch', index=True)
+    parent_path = fields.Char(index=True, unaccent=False)
     child_ids = fields.One2many('branch.model', 'parent_id', string='Child Branches')
     manager_id = fields.Many2one('res.users', string='Branch Manager')
     address = fields.Text(string='Branch Address')
@@ -20,16 +26,78 @@ class Branch(models.Model):
         ('unique_branch_code', 'unique(code)', 'Branch code must be unique!')
     ]
 
+    @api.depends('name', 'code')
+    def _compute_complete_name(self):
+        for branch in self:
+            branch.complete_name = f'[{branch.code}] {branch.name}' if branch.code else branch.name
+
     @api.constrains('parent_id')
     def _check_hierarchy(self):
         if not self._check_recursion():
             raise UserError(_('Error! You cannot create recursive branch hierarchy.'))
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        branches = super().create(vals_list)
+        # a new root branch changes no cached subtree
+        if any(vals.get('parent_id') for vals in vals_list):
+            self._clear_hierarchy_cache()
+        return branches
+
+    def write(self, vals):
+        moved = 'parent_id' in vals and any(branch.parent_id.id != vals['parent_id'] for branch in self)
+        res = super().write(vals)
+        if moved:
+            self._clear_hierarchy_cache()
+        return res
+
+    def unlink(self):
+        in_hierarchy = any(branch.parent_id or branch.child_ids for branch in self)
+        res = super().unlink()
+        if in_hierarchy:
+            self._clear_hierarchy_cache()
+        return res
+
+    def _clear_hierarchy_cache(self):
+        """Drop the cached descendant sets. Only called when the
+        hierarchy really changes, as it clears the registry cache."""
+        self.env.registry.clear_cache()
+
+    @api.model
+    @tools.ormcache('branch_id')
+    def _get_descendant_ids(self, branch_id):
+        """Return the ids of the branch and of all its sub-branches, fetched
+        with one indexed prefix query on the materialized path and cached
+        per registry."""
+        parent_path = self.sudo().browse(branch_id).parent_path
+        if not parent_path:
+            return (branch_id,)
+        return tuple(self.sudo().with_context(active_test=False).search([('parent_path', '=like', parent_path + '%')]).ids)
+
+    def get_subtree_ids(self):
+        """Return the ids of the branches of ``self`` and of their sub-branches."""
+        subtree_ids = set()
+        for branch in self:
+            subtree_ids.update(self._get_descendant_ids(branch.id))
+        return list(subtree_ids)
+
     def name_get(self):
         result = []
         for branch in self:
-            name = branch.name
-            if branch.code:
-                name = f'[{branch.code}] {name}'
-            result.append((branch.id, name))
+            result.append((branch.id, branch.complete_name))
         return result
+
+    @api.model
+    def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
+        """Search exact branch codes first, then the trigram-indexed display
+        name, stopping as soon as ``limit`` branches are found."""
+        if not name or operator not in ('ilike', '=ilike'):
+            return super()._name_search(name, domain, operator, limit, order)
+        domain = domain or []
+        branch_ids = list(self._search(expression.AND([domain, [('code', '=ilike', tools.escape_psql(name))]]),
+                                       limit=limit, order=order))
+        if limit and len(branch_ids) >= limit:
+            return branch_ids
+        return branch_ids + list(self._search(
+            expression.AND([domain, [('complete_name', operator, name), ('id', 'not in', branch_ids)]]),
+            limit=limit and limit - len(branch_ids), order=order))
@@ -0,0 +1,204 @@
+from collections import defaultdict
+
+from odoo import api, fields, models, tools
+
+AGING_KEY_FIELDS = ('company_id', 'branch_id', 'category_id', 'cheq_type', 'state', 'cheque_date')
+OUTSTANDING_STATES = ('register', 'deposit', 'transfer')
+# (label, first day, last day) relative to today, None meaning unbounded
+AGING_BUCKETS = (
+    ('overdue', None, -1),
+    ('0-7', 0, 7),
+    ('8-30', 8, 30),
+    ('31-90', 31, 90),
+    ('90+', 91, None),
+)
+
+
+def _bucket_case(column):
+    """Return a SQL CASE expression turning ``column`` (a number of days
+    from today) into its aging bucket label."""
+    conditions = []
+    for label, first_day, last_day in AGING_BUCKETS:
+        bounds = []
+        if first_day is not None:
+            bounds.append(f'{column} >= {int(first_day)}')
+        if last_day is not None:
+            bounds.append(f'{column} <= {int(last_day)}')
+        conditions.append(f"WHEN {' AND '.join(bounds)} THEN '{label}'")
+    return f"CASE {' '.join(conditions)} END"
+
+
+class ChequeAgingSummary(models.Model):
+    _name = 'cheque.aging.summary'
+    _description = 'Cheque Aging Summary'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string='Company', readonly=True, ondelete='cascade')
+    branch_id = fields.Many2one('branch.model', string='Branch', readonly=True, ondelete='cascade')
+    category_id = fields.Many2one('cheque.category', string='Category', readonly=True, ondelete='cascade')
+    cheq_type = fields.Selection([('incoming', 'Incoming'), ('outgoing', 'Outgoing')], readonly=True)
+    state = fields.Char(string='Status', readonly=True)
+    due_date = fields.Date(string='Due Date', readonly=True)
+    amount = fields.Float(string='Amount', readonly=True)
+    cheque_count = fields.Integer(string='Cheques', readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS cheque_aging_summary_key_index
+                ON cheque_aging_summary (
+                    COALESCE(company_id, 0), COALESCE(branch_id, 0), COALESCE(category_id, 0),
+                    COALESCE(cheq_type, ''), COALESCE(state, ''), COALESCE(due_date, 'infinity'::date)
+                )
+        """)
+
+    @api.model
+    def _apply_deltas(self, deltas):
+        """Add ``{key: (amount, count)}`` deltas to the summary rows with one
+        upsert, keys being ``AGING_KEY_FIELDS`` value tuples."""
+        rows = [key + delta for key, delta in deltas.items() if any(delta)]
+        if not rows:
+            return
+        self.env.cr.execute("""
+            INSERT INTO cheque_aging_summary
+                        (company_id, branch_id, category_id, cheq_type, state, due_date, amount, cheque_count)
+                 VALUES %s
+            ON CONFLICT (
+                    COALESCE(company_id, 0), COALESCE(branch_id, 0), COALESCE(category_id, 0),
+                    COALESCE(cheq_type, ''), COALESCE(state, ''), COALESCE(due_date, 'infinity'::date)
+                )
+              DO UPDATE SET amount = cheque_aging_summary.amount + EXCLUDED.amount,
+                            cheque_count = cheque_aging_summary.cheque_count + EXCLUDED.cheque_count
+        """ % ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows)),
+            [value for row in rows for value in row])
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self):
+        """Recompute the whole summary from the outstanding cheques."""
+        self.env['cheque.manage'].flush_model(list(AGING_KEY_FIELDS) + ['amount'])
+        self.env.cr.execute("DELETE FROM cheque_aging_summary")
+        self.env.cr.execute("""
+            INSERT INTO cheque_aging_summary
+                        (company_id, branch_id, category_id, cheq_type, state, due_date, amount, cheque_count)
+                 SELECT company_id, branch_id, category_id, cheq_type, state, cheque_date,
+                        SUM(COALESCE(amount, 0)), COUNT(*)
+                   FROM cheque_manage
+                  WHERE state IN %s AND cheque_date IS NOT NULL
+               GROUP BY company_id, branch_id, category_id, cheq_type, state, cheque_date
+        """, [OUTSTANDING_STATES])
+        self.invalidate_model()
+
+    @api.model
+    def _cron_rebuild(self):
+        self._rebuild()
+
+    @api.model
+    def get_forecast(self, states=OUTSTANDING_STATES, company_ids=None, branch_ids=None, include_sub_branches=True):
+        """Return the outstanding amounts and counts per company, branch,
+        category, cheque type and aging bucket, read from the summary.
+        ``states`` must be a subset of ``OUTSTANDING_STATES``, the only
+        states the summary holds."""
+        self.flush_model()
+        if branch_ids and include_sub_branches:
+            branch_ids = self.env['branch.model'].browse(branch_ids).get_subtree_ids()
+        conditions = ['state IN %s', 'cheque_count > 0']
+        params = [tuple(states)]
+        for column, ids in (('company_id', company_ids), ('branch_id', branch_ids)):
+            if ids:
+                conditions.append(f'{column} IN %s')
+                params.append(tuple(ids))
+        self.env.cr.execute(f"""
+            SELECT company_id, branch_id, category_id, cheq_type,
+                   {_bucket_case('(due_date - CURRENT_DATE)')} AS bucket,
+                   SUM(amount), SUM(cheque_count)
+              FROM cheque_aging_summary
+             WHERE {' AND '.join(conditions)} AND due_date IS NOT NULL
+          GROUP BY 1, 2, 3, 4, 5
+        """, params)
+        return [{
+            'company_id': company_id,
+            'branch_id': branch_id,
+            'category_id': category_id,
+            'cheq_type': cheq_type,
+            'bucket': bucket,
+            'amount': amount,
+            'count': count,
+        } for company_id, branch_id, category_id, cheq_type, bucket, amount, count in self.env.cr.fetchall()]
+
+
+class ChequeForecastReport(models.Model):
+    _name = 'cheque.forecast.report'
+    _description = 'Cheque Cash Forecast'
+    _auto = False
+    _order = 'due_date'
+
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    branch_id = fields.Many2one('branch.model', string='Branch', readonly=True)
+    category_id = fields.Many2one('cheque.category', string='Category', readonly=True)
+    cheq_type = fields.Selection([('incoming', 'Incoming'), ('outgoing', 'Outgoing')], readonly=True)
+    state = fields.Char(string='Status', readonly=True)
+    due_date = fields.Date(string='Due Date', readonly=True)
+    bucket = fields.Selection([(label, label) for label, _first, _last in AGING_BUCKETS],
+                              string='Aging Bucket', readonly=True)
+    amount = fields.Float(string='Amount', readonly=True)
+    cheque_count = fields.Integer(string='Cheques', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW cheque_forecast_report AS (
+                SELECT id, company_id, branch_id, category_id, cheq_type, state, due_date,
+                       {_bucket_case('(due_date - CURRENT_DATE)')} AS bucket,
+                       amount, cheque_count
+                  FROM cheque_aging_summary
+                 WHERE state IN %s AND cheque_count > 0 AND due_date IS NOT NULL
+            )
+        """, [OUTSTANDING_STATES])
+
+
+class ChequeManage(models.Model):
+    _inherit = 'cheque.manage'
+
+    def _aging_deltas(self, sign=1):
+        """Return the summary deltas of the cheques. Only outstanding cheques
+        with a due date are summarized, so draft leaves moving through the
+        allocator never touch a shared summary row."""
+        deltas = defaultdict(lambda: (0.0, 0))
+        for cheque in self:
+            if cheque.state not in OUTSTANDING_STATES or not cheque.cheque_date:
+                continue
+            key = (
+                cheque.company_id.id or None,
+                cheque.branch_id.id or None,
+                cheque.category_id.id or None,
+                cheque.cheq_type or None,
+                cheque.state or None,
+                cheque.cheque_date or None,
+            )
+            amount, count = deltas[key]
+            deltas[key] = (amount + sign * (cheque.amount or 0.0), count + sign)
+        return deltas
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        cheques = super().create(vals_list)
+        if not self.env.context.get('defer_aging_summary'):
+            self.env['cheque.aging.summary']._apply_deltas(cheques._aging_deltas())
+        return cheques
+
+    def write(self, vals):
+        if not set(AGING_KEY_FIELDS + ('amount',)) & set(vals):
+            return super().write(vals)
+        deltas = self._aging_deltas(sign=-1)
+        res = super().write(vals)
+        for key, (amount, count) in self._aging_deltas().items():
+            old_amount, old_count = deltas[key]
+            deltas[key] = (old_amount + amount, old_count + count)
+        self.env['cheque.aging.summary']._apply_deltas(deltas)
+        return res
+
+    def unlink(self):
+        deltas = self._aging_deltas(sign=-1)
+        res = super().unlink()
+        self.env['cheque.aging.summary']._apply_deltas(deltas)
+        return res
@@ -1,6 +1,12 @@
-from odoo import api, fields, models, _
+from collections import defaultdict
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
 
+from .cheque_profile import profiled
+
+LEAF_BATCH_SIZE = 1000
+
 
 class ChequeBook(models.Model):
     _name = 'cheque.book'
@@ -11,9 +17,12 @@ class ChequeBook(models.Model):
     account_id = fields.Many2one('account.account', string='Bank Account', required=True)
     start_number = fields.Integer(string='Start Number', required=True)
     end_number = fields.Integer(string='End Number', required=True)
-    current_number = fields.Integer(string='Current Number', compute='_compute_current_number', store=True)
+    current_number = fields.Integer(string='Current Number', compute='_compute_leaf_counters', store=True)
     total_leaves = fields.Integer(string='Total Leaves', compute='_compute_total_leaves')
-    remaining_leaves = fields.Integer(string='Remaining Leaves', compute='_compute_remaining_leaves')
+    used_leaves = fields.Integer(string='Used Leaves', compute='_compute_leaf_counters', store=True)
+    cancelled_leaves = fields.Integer(string='Cancelled Leaves', compute='_compute_leaf_counters', store=True)
+    remaining_leaves = fields.Integer(string='Remaining Leaves', compute='_compute_leaf_counters', store=True)
+    cheque_ids = fields.One2many('cheque.manage', 'cheque_book_id', string='Cheque Leaves')
     branch_id = fields.Many2one('branch.model', string='Branch')
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
     active = fields.Boolean(default=True)
@@ -23,23 +32,75 @@ class ChequeBook(models.Model):
         for book in self:
             book.total_leaves = book.end_number - book.start_number + 1 if book.start_number and book.end_number else 0
 
-    @api.depends('cheque_ids.state')
-    def _compute_current_number(self):
-        for book in self:
-            used_cheques = self.env['cheque.manage'].search([
-                ('cheque_book_id', '=', book.id),
-                ('state', '!=', 'cancel')
-            ], order='cheque_number DESC', limit=1)
-            book.current_number = used_cheques.cheque_number if used_cheques else book.start_number - 1
-
-    @api.depends('total_leaves', 'cheque_ids.state')
-    def _compute_remaining_leaves(self):
+    @api.depends('start_number', 'end_number', 'cheque_ids.state', 'cheque_ids.cheque_number')
+    def _compute_leaf_counters(self):
+        statistics = self._read_leaf_statistics()
         for book in self:
-            used_cheques = self.env['cheque.manage'].search_count([
-                ('cheque_book_id', '=', book.id),
-                ('state', '!=', 'cancel')
-            ])
-            book.remaining_leaves = book.total_leaves - used_cheques
+            used, cancelled, highest = statistics.get(book._origin.id, (0, 0, None))
+            total = book.end_number - book.start_number + 1 if book.start_number and book.end_number else 0
+            book.used_leaves = used
+            book.cancelled_leaves = cancelled
+            book.remaining_leaves = max(total - used - cancelled, 0)
+            book.current_number = highest if highest is not None else book.start_number - 1
+
+    def _read_leaf_statistics(self):
+        """Return ``{book_id: (used, cancelled, highest_used_number)}`` for the
+        books in ``self``, computed with one grouped query.
+
+        Draft leaves are free, cancelled leaves are counted apart and every
+        other state counts as used.
+        """
+        book_ids = tuple(book_id for book_id in self._origin.ids if book_id)
+        if not book_ids:
+            return {}
+        self.env['cheque.manage'].flush_model(['cheque_book_id', 'state', 'cheque_number'])
+        self.env.cr.execute("""
+            SELECT cheque_book_id, state, COUNT(*),
+                   MAX(CASE WHEN cheque_number ~ '^[0-9]+$' THEN cheque_number::bigint END)
+              FROM cheque_manage
+             WHERE cheque_book_id IN %s
+          GROUP BY cheque_book_id, state
+        """, [book_ids])
+        statistics = {}
+        for book_id, state, count, highest in self.env.cr.fetchall():
+            used, cancelled, book_highest = statistics.get(book_id, (0, 0, None))
+            if state == 'cancel':
+                cancelled += count
+            elif state != 'draft':
+                used += count
+                if highest is not None and (book_highest is None or highest > book_highest):
+                    book_highest = highest
+            statistics[book_id] = (used, cancelled, book_highest)
+        return statistics
+
+    def _leaf_counter_fields(self):
+        return [field for field in self._fields.values() if field.compute == '_compute_leaf_counters']
+
+    def _defer_leaf_counters(self):
+        """Leave the leaf counters of the books to the counter cron instead of
+        updating the book rows in the current transaction, so concurrent
+        transactions issuing leaves of the same book never update the same
+        row."""
+        if not self:
+            return
+        for field in self._leaf_counter_fields():
+            self.env.remove_to_compute(field, self)
+        self.env['cheque.book.counter.queue'].create([{'book_id': book.id} for book in self])
+        self.env.ref('gt_cheque_management.ir_cron_cheque_book_counters')._trigger()
+
+    @api.model
+    def _cron_refresh_leaf_counters(self):
+        """Recompute the leaf counters of the books queued by
+        :meth:`_defer_leaf_counters`."""
+        self.env.cr.execute("SELECT MAX(id), ARRAY_AGG(DISTINCT book_id) FROM cheque_book_counter_queue")
+        last_id, book_ids = self.env.cr.fetchone()
+        if not last_id:
+            return
+        books = self.browse(book_ids).exists()
+        for field in self._leaf_counter_fields():
+            self.env.add_to_compute(field, books)
+        self.env.flush_all()
+        self.env.cr.execute("DELETE FROM cheque_book_counter_queue WHERE id <= %s", [last_id])
 
     @api.constrains('start_number', 'end_number')
     def _check_numbers(self):
@@ -48,22 +109,94 @@ class ChequeBook(models.Model):
                 if book.start_number >= book.end_number:
                     raise UserError(_('Start number must be less than end number'))
 
+    def _prepare_leaf_vals(self, number):
+        self.ensure_one()
+        return {
+            'cheque_book_id': self.id,
+            'cheque_number': str(number),
+            'bank_id': self.bank_id.id,
+            'account_id': self.account_id.id,
+            'branch_id': self.branch_id.id,
+            'state': 'draft'
+        }
+
+    @profiled
     def generate_leaves(self):
-        """Generate cheque leaves for the cheque book"""
+        """Generate cheque leaves for the cheque books"""
+        self._generate_leaves_batch()
+        return True
+
+    @profiled
+    def enqueue_generate_leaves(self):
+        return self.env['cheque.job']._enqueue('generate_leaves', self)
+
+    def _generate_leaves_batch(self, batch_size=LEAF_BATCH_SIZE):
+        """Create the missing leaves of all books in ``self``.
+
+        Existing leaf numbers are fetched in a single query, the missing
+        leaves are then inserted in chunks of ``batch_size`` records.
+        """
+        ChequeManage = self.env['cheque.manage']
+        existing = defaultdict(set)
+        for leaf in ChequeManage.search_read([('cheque_book_id', 'in', self.ids)],
+                                             ['cheque_book_id', 'cheque_number']):
+            existing[leaf['cheque_book_id'][0]].add(leaf['cheque_number'])
+
+        vals_list = []
+        for book in self:
+            used_numbers = existing[book.id]
+            vals_list.extend(
+                book._prepare_leaf_vals(number)
+                for number in range(book.start_number, book.end_number + 1)
+                if str(number) not in used_numbers
+            )
+
+        leaf_ids = []
+        for index in range(0, len(vals_list), batch_size):
+            leaf_ids.extend(ChequeManage.create(vals_list[index:index + batch_size]).ids)
+        return ChequeManage.browse(leaf_ids)
+
+    def _allocate_leaves(self, count=1):
+        """Reserve the next ``count`` free leaves of the book and register them.
+
+        Free leaves are locked with ``FOR UPDATE SKIP LOCKED``, so concurrent
+        transactions allocating from the same book never get the same leaf
+        and never wait for each other. Leaves already picked by a payment are
+        not free. Fewer leaves are returned when the book runs out.
+        """
         self.ensure_one()
         ChequeManage = self.env['cheque.manage']
-        
-        for number in range(self.start_number, self.end_number + 1):
-            existing_cheque = ChequeManage.search([
-                ('cheque_book_id', '=', self.id),
-                ('cheque_number', '=', str(number))
-            ])
-            if not existing_cheque:
-                ChequeManage.create({
-                    'cheque_book_id': self.id,
-                    'cheque_number': str(number),
-                    'bank_id': self.bank_id.id,
-                    'account_id': self.account_id.id,
-                    'branch_id': self.branch_id.id,
-                    'state': 'draft'
-                })
+        ChequeManage.flush_model(['cheque_book_id', 'state', 'cheque_number'])
+        self.env['cheque.payment'].flush_model(['cheque_id'])
+        self.env.cr.execute("""
+            SELECT id
+              FROM cheque_manage leaf
+             WHERE cheque_book_id = %s AND state = 'draft'
+               AND NOT EXISTS (SELECT 1 FROM cheque_payment WHERE cheque_id = leaf.id)
+          ORDER BY length(cheque_number), cheque_number
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [self.id, count])
+        leaves = ChequeManage.browse(row[0] for row in self.env.cr.fetchall())
+        leaves.write({'state': 'register'})
+        self._defer_leaf_counters()
+        return leaves
+
+
+class ChequeBookCounterQueue(models.Model):
+    _name = 'cheque.book.counter.queue'
+    _description = 'Cheque Book Counter Refresh Queue'
+    _log_access = False
+
+    book_id = fields.Many2one('cheque.book', string='Cheque Book', required=True, ondelete='cascade')
+
+
+class ChequeManage(models.Model):
+    _inherit = 'cheque.manage'
+
+    def init(self):
+        super().init()
+        # leaves are allocated in numeric order, which for numbers without
+        # leading zeros is the order of (length, number)
+        tools.create_index(self._cr, 'cheque_manage_book_state_length_number_index', self._table,
+                           ['cheque_book_id', 'state', 'length(cheque_number)', 'cheque_number'])
@@ -1,4 +1,5 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
+from odoo.osv import expression
 
 
 class ChequeCategory(models.Model):
@@ -9,7 +10,8 @@ class ChequeCategory(models.Model):
     _order = 'complete_name'
 
     name = fields.Char(string='Category Name', required=True)
-    complete_name = fields.Char(string='Complete Name', compute='_compute_complete_name', store=True)
+    complete_name = fields.Char(string='Complete Name', compute='_compute_complete_name', store=True,
+                                index='trigram')
     parent_id = fields.Many2one('cheque.category', string='Parent Category', index=True, ondelete='cascade')
     parent_path = fields.Char(index=True)
     child_ids = fields.One2many('cheque.category', 'parent_id', string='Child Categories')
@@ -21,7 +23,7 @@ class ChequeCategory(models.Model):
     journal_id = fields.Many2one('account.journal', string='Default Journal')
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
 
-    @api.depends('name', 'parent_id.complete_name')
+    @api.depends('name', 'parent_id')
     def _compute_complete_name(self):
         for category in self:
             if category.parent_id:
@@ -29,6 +31,65 @@ class ChequeCategory(models.Model):
             else:
                 category.complete_name = category.name
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals or 'parent_id' in vals:
+            self._update_descendant_complete_names()
+        if {'parent_id', 'debit_account', 'credit_account', 'journal_id', 'active'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('category_id', 'company_id')
+    def _get_account_defaults(self, category_id, company_id):
+        """Return the effective ``(debit_account, credit_account, journal)``
+        ids of a category.
+
+        Each value is taken from the category itself, else from the closest
+        parent defining it, else from the company defaults. Results are kept
+        in the per-registry LRU cache until a category changes.
+        """
+        parent_path = self.sudo().browse(category_id).parent_path if category_id else ''
+        ancestor_ids = [int(ancestor_id) for ancestor_id in (parent_path or '').split('/') if ancestor_id]
+        defaults = {'debit_account': False, 'credit_account': False, 'journal_id': False}
+        for ancestor in self.sudo().browse(reversed(ancestor_ids)):
+            for field_name in defaults:
+                defaults[field_name] = defaults[field_name] or ancestor[field_name].id
+        company = self.env['res.company'].sudo().browse(company_id)
+        return (
+            defaults['debit_account'] or company.cheque_debit_account_id.id,
+            defaults['credit_account'] or company.cheque_credit_account_id.id,
+            defaults['journal_id'] or company.cheque_journal_id.id,
+        )
+
+    def _update_descendant_complete_names(self):
+        """Rebuild the complete name of the categories and of all their
+        descendants with one statement joining the ancestors listed in
+        ``parent_path``, then drop only the affected cache entries."""
+        self.flush_model(['name', 'parent_id', 'parent_path', 'complete_name'])
+        self.env.cr.execute("""
+            UPDATE cheque_category category
+               SET complete_name = names.complete_name
+              FROM (
+                    SELECT descendant.id, string_agg(ancestor.name, ' / ' ORDER BY path.position) AS complete_name
+                      FROM cheque_category descendant
+                CROSS JOIN LATERAL unnest(string_to_array(rtrim(descendant.parent_path, '/'), '/')::int[])
+                           WITH ORDINALITY AS path(ancestor_id, position)
+                      JOIN cheque_category ancestor ON ancestor.id = path.ancestor_id
+                     WHERE descendant.parent_path LIKE ANY(%s)
+                  GROUP BY descendant.id
+                   ) names
+             WHERE category.id = names.id
+               AND category.complete_name IS DISTINCT FROM names.complete_name
+         RETURNING category.id
+        """, [[category.parent_path + '%' for category in self]])
+        self.browse(row[0] for row in self.env.cr.fetchall()).invalidate_recordset(['complete_name'])
+
     @api.constrains('parent_id')
     def _check_hierarchy(self):
         if not self._check_recursion():
@@ -39,3 +100,19 @@ class ChequeCategory(models.Model):
         for record in self:
             result.append((record.id, record.complete_name))
         return result
+
+    @api.model
+    def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
+        """Search the trigram-indexed complete name, listing the categories
+        whose complete name starts with ``name`` first and stopping as soon
+        as ``limit`` categories are found."""
+        if not name or operator != 'ilike':
+            return super()._name_search(name, domain, operator, limit, order)
+        domain = domain or []
+        category_ids = list(self._search(expression.AND([domain, [('complete_name', '=ilike', tools.escape_psql(name) + '%')]]),
+                                         limit=limit, order=order))
+        if limit and len(category_ids) >= limit:
+            return category_ids
+        return category_ids + list(self._search(
+            expression.AND([domain, [('complete_name', 'ilike', name), ('id', 'not in', category_ids)]]),
+            limit=limit and limit - len(category_ids), order=order))
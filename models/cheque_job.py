@@ -0,0 +1,172 @@
+import base64
+import logging
+import time
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+JOB_CHUNK_SIZES = {
+    'generate_leaves': 1,
+    'report': 1,
+    'restore': 500,
+    'clear': 500,
+}
+
+
+class ChequeJob(models.Model):
+    _name = 'cheque.job'
+    _description = 'Cheque Background Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True)
+    job_type = fields.Selection([
+        ('generate_leaves', 'Generate Leaves'),
+        ('report', 'Cheque Report'),
+        ('restore', 'Restore Archived Cheques'),
+        ('clear', 'Clear Cheques'),
+    ], string='Job Type', required=True)
+    res_model = fields.Char(string='Model', required=True)
+    res_ids = fields.Json(string='Record IDs')
+    options = fields.Json(string='Options')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, index=True)
+    total_count = fields.Integer(string='Total Records')
+    processed_count = fields.Integer(string='Processed Records')
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+    attempt_count = fields.Integer(string='Attempts')
+    max_attempts = fields.Integer(string='Max Attempts', default=3)
+    error_message = fields.Text(string='Error')
+    result_attachment_id = fields.Many2one('ir.attachment', string='Result')
+    date_started = fields.Datetime(string='Started On')
+    date_done = fields.Datetime(string='Done On')
+    user_id = fields.Many2one('res.users', string='User', default=lambda self: self.env.user)
+    company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
+
+    @api.depends('processed_count', 'total_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+
+    @api.model
+    def _enqueue(self, job_type, records, options=None):
+        """Create a job processing ``records`` in the background and wake up
+        the job runner. Return an action showing the job progress."""
+        job = self.create({
+            'name': '%s (%s)' % (dict(self._fields['job_type'].selection)[job_type], len(records)),
+            'job_type': job_type,
+            'res_model': records._name,
+            'res_ids': records.ids,
+            'options': options or {},
+            'total_count': len(records),
+        })
+        self.env.ref('gt_cheque_management.ir_cron_cheque_job_runner')._trigger()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Background Job'),
+            'res_model': self._name,
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_retry(self):
+        self.filtered(lambda job: job.state == 'failed').write({
+            'state': 'pending',
+            'attempt_count': 0,
+            'error_message': False,
+        })
+        self.env.ref('gt_cheque_management.ir_cron_cheque_job_runner')._trigger()
+
+    @api.model
+    def _cron_run_jobs(self, auto_commit=True, time_limit=None):
+        """Process the pending jobs chunk by chunk, oldest first.
+
+        With ``auto_commit`` every chunk is committed, so a run killed by the
+        worker time limit resumes after the last committed chunk. A failing
+        chunk is rolled back and retried on the next run until the job runs
+        out of attempts.
+        """
+        started = time.monotonic()
+        for job in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            if not job._run(auto_commit=auto_commit, deadline=time_limit and started + time_limit):
+                break
+
+    def _run(self, auto_commit=True, deadline=None):
+        """Run the job until it is done, fails or reaches ``deadline``.
+        Return whether the runner may go on with the next job."""
+        self.ensure_one()
+        if self.state == 'pending':
+            self.write({'state': 'running', 'date_started': fields.Datetime.now()})
+        chunk_size = JOB_CHUNK_SIZES[self.job_type]
+        records = self.env[self.res_model].with_user(self.user_id).with_company(self.company_id)
+        while self.processed_count < self.total_count:
+            if deadline and time.monotonic() >= deadline:
+                return False
+            chunk = records.browse(self.res_ids[self.processed_count:self.processed_count + chunk_size]).exists()
+            try:
+                getattr(self, '_run_%s' % self.job_type)(chunk)
+                self.processed_count = min(self.processed_count + chunk_size, self.total_count)
+                if auto_commit:
+                    self.env.cr.commit()
+            except Exception as error:
+                if not auto_commit:
+                    raise
+                self.env.cr.rollback()
+                _logger.exception(f"Cheque job {self.id} failed")
+                self.attempt_count += 1
+                self.write({
+                    'state': 'failed' if self.attempt_count >= self.max_attempts else 'pending',
+                    'error_message': str(error),
+                })
+                self.env.cr.commit()
+                return True
+        self.write({
+            'state': 'done',
+            'processed_count': self.total_count,
+            'date_done': fields.Datetime.now(),
+        })
+        if auto_commit:
+            self.env.cr.commit()
+        return True
+
+    def _run_generate_leaves(self, books):
+        books._generate_leaves_batch()
+
+    def _run_restore(self, archived_cheques):
+        archived_cheques._restore_cheques()
+
+    def _run_clear(self, payments):
+        payments._clear_cheques(combine=self.options.get('combine', False))
+
+    def _run_report(self, wizards):
+        options = dict(self.options)
+        report_format = options.pop('format', 'pdf')
+        wizard = wizards.create(options)
+        if report_format == 'xlsx':
+            content, extension = wizard._render_xlsx(), 'xlsx'
+        else:
+            content = self.env['ir.actions.report'].with_user(self.user_id)._render_qweb_pdf(
+                'gt_cheque_management.action_cheque_report_stream', wizard.ids)[0]
+            extension = 'pdf'
+        self.result_attachment_id = self.env['ir.attachment'].create({
+            'name': 'cheque_report_%s.%s' % (wizard.cheq_type, extension),
+            'datas': base64.b64encode(content),
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+
+    def action_download_result(self):
+        self.ensure_one()
+        if not self.result_attachment_id:
+            raise UserError(_('This job has no result to download.'))
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % self.result_attachment_id.id,
+            'target': 'self',
+        }
@@ -1,6 +1,12 @@
+from collections import defaultdict
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from .cheque_profile import profiled
+
+CONFIRMABLE_STAGES = ('draft', 'deposited')
+
 
 class ChequePayment(models.Model):
     _name = 'cheque.payment'
@@ -8,7 +14,7 @@ class ChequePayment(models.Model):
 
     name = fields.Char(string='Payment Name', required=True)
     cheque_book_id = fields.Many2one('cheque.book', string='Cheque Book', required=True)
-    cheque_id = fields.Many2one('cheque.manage', string='Cheque', domain="[('cheque_book_id', '=', cheque_book_id), ('state', '=', 'draft')]")
+    cheque_id = fields.Many2one('cheque.manage', string='Cheque', domain="[('cheque_book_id', '=', cheque_book_id), ('state', '=', 'draft'), ('payment_ids', '=', False)]")
     recipient_id = fields.Many2one('res.partner', string='Recipient', required=True)
     amount = fields.Monetary(string="Amount", currency_field='currency_id')
     currency_id = fields.Many2one('res.currency', string='Currency', required=True,
@@ -27,65 +33,208 @@ class ChequePayment(models.Model):
         ('cancel', 'Cancelled')
     ], string='Stage', default='draft')
 
+    _sql_constraints = [
+        ('cheque_id_unique', 'unique(cheque_id)', 'A cheque can only be used by one payment.'),
+    ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('category_id'):
+                debit_account, credit_account, journal = self._get_category_defaults(vals['category_id'])
+                if not vals.get('debit_account'):
+                    vals['debit_account'] = debit_account
+                if not vals.get('credit_account'):
+                    vals['credit_account'] = credit_account
+                if not vals.get('journal_id'):
+                    vals['journal_id'] = journal
+        return super().create(vals_list)
+
+    @api.model
+    def _get_category_defaults(self, category_id):
+        return self.env['cheque.category']._get_account_defaults(category_id, self.env.company.id)
+
     @api.onchange('category_id')
     def _onchange_category_id(self):
         if self.category_id:
-            self.debit_account = self.category_id.debit_account
-            self.credit_account = self.category_id.credit_account
-            self.journal_id = self.category_id.journal_id
+            debit_account, credit_account, journal = self._get_category_defaults(self.category_id._origin.id)
+            self.debit_account = debit_account
+            self.credit_account = credit_account
+            self.journal_id = journal
 
     @api.onchange('cheque_book_id')
     def _onchange_cheque_book_id(self):
         self.cheque_id = False
 
+    @profiled
     def action_confirm_payment(self):
-        if not self.cheque_id:
-            raise UserError(_('Please select a cheque from the cheque book.'))
+        self._check_confirmable()
+        self._lock_picked_cheques()
+        self._allocate_missing_cheques()
+
+        cheque_ids_by_state = defaultdict(list)
+        for payment in self:
+            cheque = payment.cheque_id
+            state = 'register' if cheque.state == 'draft' else cheque.state
+            if payment.amount == cheque.amount:
+                state = 'done'
+            elif payment.amount < cheque.amount:
+                state = 'deposit'
+            if state != cheque.state:
+                cheque_ids_by_state[state].append(cheque.id)
+        for state, cheque_ids in cheque_ids_by_state.items():
+            self.env['cheque.manage'].browse(cheque_ids).write({'state': state})
+        if cheque_ids_by_state:
+            self.cheque_book_id._defer_leaf_counters()
+
+    def _check_confirmable(self):
+        not_confirmable = self.filtered(lambda payment: payment.stage not in CONFIRMABLE_STAGES)
+        if not_confirmable:
+            raise UserError(_('Cheque must be in draft or deposited stage to be confirmed: %s',
+                              ', '.join(not_confirmable.mapped('name'))))
 
-        if self.cheque_id.state == 'draft':
-            self.cheque_id.state = 'register'
+    def _lock_picked_cheques(self):
+        """Lock the free leaves picked by hand, raising a single error for the
+        ones another transaction is issuing or has already issued."""
+        cheques = self.cheque_id.filtered(lambda cheque: cheque.state == 'draft')
+        if not cheques:
+            return
+        self.env['cheque.manage'].flush_model(['state'])
+        self.env.cr.execute("""
+            SELECT id
+              FROM cheque_manage
+             WHERE id IN %s AND state = 'draft'
+          ORDER BY id
+               FOR UPDATE SKIP LOCKED
+        """, [tuple(cheques.ids)])
+        locked_ids = {row[0] for row in self.env.cr.fetchall()}
+        taken = cheques.filtered(lambda cheque: cheque.id not in locked_ids)
+        if taken:
+            raise UserError(_('These cheques are being issued by another payment, please pick other ones:\n%s',
+                              '\n'.join(taken.mapped('display_name'))))
 
-        if self.amount == self.cheque_id.amount:
-            self.cheque_id.state = 'done'
-        elif self.amount < self.cheque_id.amount:
-            self.cheque_id.state = 'deposit'
+    def _allocate_missing_cheques(self):
+        """Give a free leaf of their cheque book to the payments without a
+        cheque, raising a single error for every book running out."""
+        payment_ids_by_book = defaultdict(list)
+        for payment in self.filtered(lambda payment: not payment.cheque_id):
+            payment_ids_by_book[payment.cheque_book_id].append(payment.id)
+        errors = []
+        pairs = []
+        for book, payment_ids in payment_ids_by_book.items():
+            leaves = book._allocate_leaves(len(payment_ids))
+            if len(leaves) < len(payment_ids):
+                errors.append(_('%(book)s: %(missing)s cheque(s) missing',
+                                book=book.display_name, missing=len(payment_ids) - len(leaves)))
+                continue
+            pairs.extend(zip(payment_ids, leaves.ids))
+        if errors:
+            raise UserError(_('There are not enough free cheques left in the cheque books:\n%s', '\n'.join(errors)))
+        if pairs:
+            self._write_cheque_pairs(pairs)
 
+    def _write_cheque_pairs(self, pairs):
+        """Set the cheque of many payments with one statement, ``pairs`` being
+        ``(payment_id, cheque_id)`` tuples."""
+        self.flush_model(['cheque_id'])
+        self.env.cr.execute("""
+            UPDATE cheque_payment payment
+               SET cheque_id = pairs.cheque_id, write_uid = %%s, write_date = (now() at time zone 'UTC')
+              FROM (VALUES %s) AS pairs (id, cheque_id)
+             WHERE payment.id = pairs.id
+        """ % ', '.join(['(%s, %s)'] * len(pairs)), [self.env.uid] + [value for pair in pairs for value in pair])
+        self.browse(payment_id for payment_id, _cheque_id in pairs).invalidate_recordset(
+            ['cheque_id', 'write_uid', 'write_date'])
+        self.env['cheque.manage'].invalidate_model(['payment_ids'])
 
+    def _prepare_clearing_move_lines(self):
+        self.ensure_one()
+        debit_account, credit_account, _journal = self._get_category_defaults(self.category_id.id)
+        return [
+            (0, 0, {
+                'account_id': self.debit_account.id or debit_account,
+                'partner_id': self.recipient_id.id,
+                'name': f"{self.name} - Cleared",
+                'debit': self.amount,
+                'credit': 0,
+                'cheque_id': self.id,
+            }),
+            (0, 0, {
+                'account_id': self.credit_account.id or credit_account,
+                'partner_id': self.recipient_id.id,
+                'name': f"{self.name} - Cleared",
+                'debit': 0,
+                'credit': self.amount,
+                'cheque_id': self.id,
+            })
+        ]
+
+    @profiled
     def action_clear_cheque(self):
-        debit_account, credit_account = self.category_id.debit_account, self.category_id.credit_account
-
-        move_vals = {
-            'date': fields.Date.today(),
-            'journal_id': self.journal_id.id,
-            'ref': f"Cheque Cleared - {self.name}",
-            'line_ids': [
-                (0, 0, {
-                    'account_id': debit_account.id,
-                    'partner_id': self.recipient_id.id,
-                    'name': f"{self.name} - Cleared",
-                    'debit': self.amount,
-                    'credit': 0,
-                    'cheque_id': self.id,
-                }),
-                (0, 0, {
-                    'account_id': credit_account.id,
-                    'partner_id': self.recipient_id.id,
-                    'name': f"{self.name} - Cleared",
-                    'debit': 0,
-                    'credit': self.amount,
-                    'cheque_id': self.id,
+        self._clear_cheques(combine=self.env.context.get('combine_clearing_moves', False))
+
+    @profiled
+    def enqueue_clear_cheque(self):
+        self._check_clearable()
+        return self.env['cheque.job']._enqueue(
+            'clear', self, {'combine': self.env.context.get('combine_clearing_moves', False)})
+
+    def _check_clearable(self):
+        not_deposited = self.filtered(lambda payment: payment.stage != 'deposited')
+        if not_deposited:
+            raise UserError(_('Cheque must be in deposited stage to be cleared: %s',
+                              ', '.join(not_deposited.mapped('name'))))
+
+    def _clear_cheques(self, clearing_dates=None, combine=False):
+        """Clear the cheques of ``self`` with batched journal entries.
+
+        Payments are grouped by journal and clearing date, ``clearing_dates``
+        optionally maps payment ids to their clearing date (today by
+        default). All moves are created with one multi-create, posted with
+        one ``action_post`` call and the stage is updated with one write.
+        With ``combine`` a single move is made per journal and date instead
+        of one move per payment.
+        """
+        if not self:
+            return self.env['account.move']
+        self._check_clearable()
+        clearing_dates = clearing_dates or {}
+        today = fields.Date.context_today(self)
+        groups = defaultdict(list)
+        for payment in self:
+            groups[(payment.journal_id, clearing_dates.get(payment.id, today))].append(payment.id)
+
+        move_vals_list = []
+        for (journal, date), payment_ids in groups.items():
+            payments = self.browse(payment_ids)
+            if combine:
+                move_vals_list.append({
+                    'date': date,
+                    'journal_id': journal.id,
+                    'ref': f"Cheques Cleared - {journal.name} {date}",
+                    'line_ids': [line for payment in payments for line in payment._prepare_clearing_move_lines()],
                 })
-            ]
-        }
-        move_id = self.env['account.move'].create(move_vals)
-        move_id.action_post()
+            else:
+                move_vals_list.extend({
+                    'date': date,
+                    'journal_id': journal.id,
+                    'ref': f"Cheque Cleared - {payment.name}",
+                    'line_ids': payment._prepare_clearing_move_lines(),
+                } for payment in payments)
+
+        moves = self.env['account.move'].create(move_vals_list)
+        moves.action_post()
 
         self.write({'stage': 'cleared'})
+        return moves
 
+    @profiled
     def send_to_bank(self):
-        if self.stage != 'draft':
-            raise UserError('Cheque must be in draft stage to be sent to the bank.')
-        self.stage = 'deposited'
+        not_draft = self.filtered(lambda payment: payment.stage != 'draft')
+        if not_draft:
+            raise UserError(_('Cheque must be in draft stage to be sent to the bank: %s',
+                              ', '.join(not_draft.mapped('name'))))
+        self.write({'stage': 'deposited'})
 
 
     def action_bounce(self):
@@ -97,3 +246,9 @@ class ChequePayment(models.Model):
             'target': 'new',
             'context': {'default_cheque_payment_id': self.id},
         }
+
+
+class ChequeManage(models.Model):
+    _inherit = 'cheque.manage'
+
+    payment_ids = fields.One2many('cheque.payment', 'cheque_id', string='Payments')
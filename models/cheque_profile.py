@@ -0,0 +1,135 @@
+import functools
+import logging
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+PROFILING_PARAM = 'gt_cheque_management.profiling'
+SAMPLE_LIMIT_PARAM = 'gt_cheque_management.profiling_sample_limit'
+DEFAULT_SAMPLE_LIMIT = 10000
+
+
+def profiled(method):
+    """Record the SQL and Python cost of a cheque action.
+
+    Profiling is enabled with the ``gt_cheque_management.profiling`` system
+    parameter. When it is off the only overhead is one cached parameter
+    lookup. Samples are written through their own cursor, so calls that
+    fail or roll back are recorded too, and a profiling error never hides
+    the outcome of the action.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.env['cheque.profile.sample']._profiling_enabled():
+            return method(self, *args, **kwargs)
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_count'):
+            thread.query_count = 0
+            thread.query_time = 0
+        query_count, query_time = thread.query_count, thread.query_time
+        record_count = len(self)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = method(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            try:
+                duration = time.perf_counter() - started
+                sql_time = thread.query_time - query_time
+                self.env['cheque.profile.sample']._record({
+                    'model': self._name,
+                    'action': method.__name__,
+                    'record_count': record_count,
+                    'sql_count': thread.query_count - query_count,
+                    'sql_time': sql_time,
+                    'python_time': max(duration - sql_time, 0.0),
+                    'duration': duration,
+                    'failed': failed,
+                    'user_id': self.env.uid,
+                })
+            except Exception:
+                _logger.warning(f"Could not record the profiling sample of {self._name}.{method.__name__}",
+                                exc_info=True)
+    return wrapper
+
+
+class ChequeProfileSample(models.Model):
+    _name = 'cheque.profile.sample'
+    _description = 'Cheque Action Profiling Sample'
+    _order = 'id desc'
+    _log_access = False
+
+    model = fields.Char(string='Model', required=True)
+    action = fields.Char(string='Action', required=True)
+    record_count = fields.Integer(string='Records')
+    sql_count = fields.Integer(string='SQL Queries')
+    sql_time = fields.Float(string='SQL Time (s)', digits=(16, 6))
+    python_time = fields.Float(string='Python Time (s)', digits=(16, 6))
+    duration = fields.Float(string='Duration (s)', digits=(16, 6))
+    failed = fields.Boolean(string='Failed')
+    user_id = fields.Many2one('res.users', string='User')
+    create_date = fields.Datetime(string='Recorded On', default=fields.Datetime.now)
+
+    @api.model
+    @tools.ormcache()
+    def _profiling_enabled(self):
+        return tools.str2bool(self.env['ir.config_parameter'].sudo().get_param(PROFILING_PARAM, 'False'))
+
+    @api.model
+    def _record(self, values):
+        """Store a sample in a separate transaction and keep only the latest
+        ones, so the table works as a ring buffer of the profiling sample
+        limit."""
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            sample = env[self._name].create(values)
+            limit = int(env['ir.config_parameter'].get_param(SAMPLE_LIMIT_PARAM, DEFAULT_SAMPLE_LIMIT))
+            if sample.id % 100 == 0:
+                cr.execute("DELETE FROM cheque_profile_sample WHERE id <= %s", [sample.id - limit])
+
+
+class ChequeProfileSummary(models.Model):
+    _name = 'cheque.profile.summary'
+    _description = 'Cheque Action Profiling Summary'
+    _auto = False
+    _order = 'p95_duration desc'
+
+    model = fields.Char(string='Model', readonly=True)
+    action = fields.Char(string='Action', readonly=True)
+    call_count = fields.Integer(string='Calls', readonly=True)
+    failure_count = fields.Integer(string='Failures', readonly=True)
+    avg_records = fields.Float(string='Avg Records', readonly=True)
+    avg_sql_count = fields.Float(string='Avg SQL Queries', readonly=True)
+    avg_sql_time = fields.Float(string='Avg SQL Time (s)', digits=(16, 6), readonly=True)
+    avg_python_time = fields.Float(string='Avg Python Time (s)', digits=(16, 6), readonly=True)
+    p50_duration = fields.Float(string='P50 Duration (s)', digits=(16, 6), readonly=True)
+    p95_duration = fields.Float(string='P95 Duration (s)', digits=(16, 6), readonly=True)
+    p99_duration = fields.Float(string='P99 Duration (s)', digits=(16, 6), readonly=True)
+    max_duration = fields.Float(string='Max Duration (s)', digits=(16, 6), readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW cheque_profile_summary AS (
+                SELECT MIN(id) AS id,
+                       model,
+                       action,
+                       COUNT(*) AS call_count,
+                       COUNT(*) FILTER (WHERE failed) AS failure_count,
+                       AVG(record_count) AS avg_records,
+                       AVG(sql_count) AS avg_sql_count,
+                       AVG(sql_time) AS avg_sql_time,
+                       AVG(python_time) AS avg_python_time,
+                       PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY duration) AS p50_duration,
+                       PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY duration) AS p95_duration,
+                       PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY duration) AS p99_duration,
+                       MAX(duration) AS max_duration
+                  FROM cheque_profile_sample
+              GROUP BY model, action
+            )
+        """)
@@ -0,0 +1,32 @@
+from odoo import fields, models
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    cheque_archive_retention_days = fields.Integer(string='Cheque Archive Retention (Days)', default=7)
+    cheque_archive_purge_batch_size = fields.Integer(string='Cheque Archive Purge Batch Size', default=1000)
+    cheque_archive_purge_time_limit = fields.Integer(string='Cheque Archive Purge Time Limit (Seconds)', default=240)
+    cheque_debit_account_id = fields.Many2one('account.account', string='Default Cheque Debit Account')
+    cheque_credit_account_id = fields.Many2one('account.account', string='Default Cheque Credit Account')
+    cheque_journal_id = fields.Many2one('account.journal', string='Default Cheque Journal')
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'cheque_debit_account_id', 'cheque_credit_account_id', 'cheque_journal_id'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = 'res.config.settings'
+
+    cheque_archive_retention_days = fields.Integer(related='company_id.cheque_archive_retention_days',
+                                                   readonly=False)
+    cheque_archive_purge_batch_size = fields.Integer(related='company_id.cheque_archive_purge_batch_size',
+                                                     readonly=False)
+    cheque_archive_purge_time_limit = fields.Integer(related='company_id.cheque_archive_purge_time_limit',
+                                                     readonly=False)
+    cheque_debit_account_id = fields.Many2one(related='company_id.cheque_debit_account_id', readonly=False)
+    cheque_credit_account_id = fields.Many2one(related='company_id.cheque_credit_account_id', readonly=False)
+    cheque_journal_id = fields.Many2one(related='company_id.cheque_journal_id', readonly=False)
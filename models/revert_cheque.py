@@ -1,6 +1,9 @@
 from datetime import timedelta
 from odoo import api, fields, models
 import logging
+import time
+
+from .cheque_profile import profiled
 
 
 _logger = logging.getLogger(__name__)
@@ -10,7 +13,7 @@ class RevertCheque(models.Model):
     _name = 'revert.cheque'
     _description = 'Revert Cheque'
 
-    original_cheque_id = fields.Integer(string='Original Cheque ID')
+    original_cheque_id = fields.Integer(string='Original Cheque ID', index=True)
     seq_no = fields.Char(string='Sequence')
     name = fields.Char(string='Name')
     attachment_count = fields.Integer(string='Attachment Count')
@@ -50,56 +53,140 @@ class RevertCheque(models.Model):
                                     default=fields.Datetime.now)
 
     @api.model
-    def delete_old_archives(self):
-        one_week_ago = fields.Datetime.now() - timedelta(days=7)
-        old_archives = self.search([('deletion_date', '<', one_week_ago)])
-        old_archives.unlink()
-        _logger.info(f"Successfully deleted {len(old_archives)} old archive(s) older than one week.")
+    @profiled
+    def delete_old_archives(self, auto_commit=True, time_limit=None):
+        """Purge the archives older than the retention period of their company.
 
-    def restore_cheque(self):
-        cheque_manage_model = self.env['cheque.manage']
-        restored_cheques = []
+        Archives are deleted oldest first in batches of the company purge
+        batch size. With ``auto_commit`` each batch is committed, so a killed
+        run resumes from the remaining archives on its next call. When
+        ``time_limit`` (in seconds, the company purge time limit by default,
+        0 for none) is reached the run stops after the current batch and
+        leaves the snapshots to the next run.
+        """
+        if time_limit is None:
+            time_limit = self.env.company.cheque_archive_purge_time_limit
+        started = time.monotonic()
+        timed_out = False
+        deleted = 0
+        for company in self.env['res.company'].search([]):
+            company_ids = [company.id]
+            if company == self.env.company:
+                company_ids.append(False)
+            cutoff = fields.Datetime.now() - timedelta(days=company.cheque_archive_retention_days)
+            domain = [('company_id', 'in', company_ids), ('deletion_date', '<', cutoff)]
+            batch_size = company.cheque_archive_purge_batch_size or 1000
+            while True:
+                old_archives = self.search(domain, order='deletion_date, id', limit=batch_size)
+                if not old_archives:
+                    break
+                old_archives.unlink()
+                deleted += len(old_archives)
+                if auto_commit:
+                    self.env.cr.commit()
+                timed_out = bool(time_limit) and time.monotonic() - started >= time_limit
+                if timed_out:
+                    break
+            if timed_out:
+                _logger.info(f"Archive purge stopped after reaching its time limit of {time_limit} seconds.")
+                break
+        if not timed_out:
+            deleted += self.env['revert.cheque.archive']._purge_expired(auto_commit=auto_commit)
+        elapsed = time.monotonic() - started
+        _logger.info(
+            f"Successfully deleted {deleted} old archive(s) in {elapsed:.2f}s "
+            f"({deleted / elapsed if elapsed else 0:.0f} rows/s).")
+        return deleted
+
+    def _prepare_restore_vals(self):
+        self.ensure_one()
+        return {
+            'seq_no': self.seq_no,
+            'name': self.name,
+            'payer': self.payer.id,
+            'bank_account': self.bank_account.id,
+            'debit_account': self.debit_account.id,
+            'credit_account': self.credit_account.id,
+            'debit': self.debit,
+            'credit': self.credit,
+            'journal_id': self.journal_id.id,
+            'cheque_date': self.cheque_date,
+            'cashed_date': self.cashed_date,
+            'return_date': self.return_date,
+            'cheque_receive_date': self.cheque_receive_date,
+            'cheque_no': self.cheque_no,
+            'amount': self.amount,
+            'bounced': self.bounced,
+            'partner_id': self.partner_id.id,
+            'cheq_type': self.cheq_type,
+            'state': 'draft',
+            'description': self.description,
+            'company_id': self.company_id.id,
+            'company_currency_id': self.company_currency_id.id,
+            'move_line_ids': [(6, 0, self.move_line_ids.ids)],
+            'cheq_attachment_ids': [(6, 0, self.cheq_attachment_ids.ids)],
+        }
 
+    def _compact_to_snapshots(self):
+        """Move the archives to the compact snapshot storage in bulk and
+        return the created snapshots."""
+        Archive = self.env['revert.cheque.archive']
+        Archive._ensure_partitions(self.mapped('deletion_date'))
+        vals_list = []
         for archived_cheque in self:
-            restored_cheque = cheque_manage_model.create({
-                'seq_no': archived_cheque.seq_no,
+            payload = archived_cheque._prepare_restore_vals()
+            payload['move_line_ids'] = archived_cheque.move_line_ids.ids
+            payload['cheq_attachment_ids'] = archived_cheque.cheq_attachment_ids.ids
+            payload['state'] = archived_cheque.state
+            for field_name in ('cheque_date', 'cashed_date', 'return_date', 'cheque_receive_date'):
+                payload[field_name] = fields.Date.to_string(payload[field_name])
+            vals_list.append({
+                'original_cheque_id': archived_cheque.original_cheque_id,
+                'company_id': archived_cheque.company_id.id,
                 'name': archived_cheque.name,
-                'payer': archived_cheque.payer.id,
-                'bank_account': archived_cheque.bank_account.id,
-                'debit_account': archived_cheque.debit_account.id,
-                'credit_account': archived_cheque.credit_account.id,
-                'debit': archived_cheque.debit,
-                'credit': archived_cheque.credit,
-                'journal_id': archived_cheque.journal_id.id,
-                'cheque_date': archived_cheque.cheque_date,
-                'cashed_date': archived_cheque.cashed_date,
-                'return_date': archived_cheque.return_date,
-                'cheque_receive_date': archived_cheque.cheque_receive_date,
                 'cheque_no': archived_cheque.cheque_no,
                 'amount': archived_cheque.amount,
-                'bounced': archived_cheque.bounced,
-                'partner_id': archived_cheque.partner_id.id,
-                'cheq_type': archived_cheque.cheq_type,
-                'state': 'draft',
-                'description': archived_cheque.description,
-                'company_id': archived_cheque.company_id.id,
-                'company_currency_id': archived_cheque.company_currency_id.id,
-                'move_line_ids': [(6, 0, archived_cheque.move_line_ids.ids)],
+                'deletion_date': archived_cheque.deletion_date or fields.Datetime.now(),
+                'payload': payload,
             })
-            _logger.info(f"Cheque restored with new ID: {restored_cheque.id}")
-            restored_cheques.append(restored_cheque)
-            for move in restored_cheque.move_line_ids.mapped('move_id'):
-                if move.state == 'draft':
-                    _logger.info(
-                        f"Posting journal entry with ID: {move.id} for restored cheque ID: {restored_cheque.id}")
-                    move.action_post()
+        snapshots = Archive.create(vals_list)
+        Archive._detach_attachments(self)
         self.unlink()
-        _logger.info(f"Archived cheques with IDs: {self.ids} deleted after restoration")
-        return {
-            'type': 'ir.actions.act_window',
-            'name': 'Restored Cheque',
-            'res_model': 'cheque.manage',
-            'view_mode': 'form',
-            'res_id': restored_cheques[0].id if restored_cheques else False,
-            'target': 'current',
-        }
+        return snapshots
+
+    @api.model
+    def _cron_compact_to_snapshots(self, batch_size=1000, auto_commit=True, time_limit=None):
+        """Move every archive to the compact snapshot storage, oldest first
+        and in committed batches, stopping after the batch that reaches
+        ``time_limit`` (in seconds)."""
+        started = time.monotonic()
+        compacted = 0
+        while True:
+            archived_cheques = self.search([], order='deletion_date, id', limit=batch_size)
+            if not archived_cheques:
+                break
+            compacted += len(archived_cheques._compact_to_snapshots())
+            if auto_commit:
+                self.env.cr.commit()
+            if time_limit and time.monotonic() - started >= time_limit:
+                break
+        _logger.info(f"Compacted {compacted} archive(s) to snapshots in {time.monotonic() - started:.2f}s.")
+        return compacted
+
+    @profiled
+    def restore_cheque(self):
+        return self._restore_cheques()._action_open_restored()
+
+    @profiled
+    def enqueue_restore_cheque(self):
+        return self.env['cheque.job']._enqueue('restore', self)
+
+    def _restore_cheques(self):
+        """Recreate the archived cheques and delete the archives."""
+        vals_list = [archived_cheque._prepare_restore_vals() for archived_cheque in self]
+        self.env['revert.cheque.archive']._detach_attachments(self)
+        restored_cheques = self.env['cheque.manage']._create_restored(vals_list)
+        archived_ids = self.ids
+        self.unlink()
+        _logger.info(f"Archived cheques with IDs: {archived_ids} deleted after restoration")
+        return restored_cheques
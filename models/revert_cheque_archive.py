@@ -0,0 +1,252 @@
+import logging
+import time
+from datetime import date, timedelta
+
+from odoo import api, fields, models
+
+from .cheque_profile import profiled
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = (
+    'seq_no', 'name', 'cheque_book_id', 'cheque_number', 'branch_id', 'bank_id', 'account_id', 'category_id',
+    'payer', 'bank_account', 'debit_account', 'credit_account', 'debit', 'credit', 'journal_id',
+    'cheque_date', 'cashed_date', 'return_date', 'cheque_receive_date', 'cheque_no', 'amount', 'bounced',
+    'partner_id', 'cheq_type', 'state', 'description', 'company_id', 'company_currency_id', 'move_line_ids',
+    'cheq_attachment_ids',
+)
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+class RevertChequeArchive(models.Model):
+    """Compact archive of deleted cheques.
+
+    Each deleted cheque is one row holding its snapshot as a JSONB payload
+    next to a few indexed key columns. The table is partitioned by deletion
+    month, so purging expired archives drops whole partitions.
+    """
+    _name = 'revert.cheque.archive'
+    _description = 'Cheque Archive Snapshot'
+    _auto = False
+    _log_access = False
+    _order = 'deletion_date desc, id desc'
+
+    original_cheque_id = fields.Integer(string='Original Cheque ID', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    name = fields.Char(string='Name', readonly=True)
+    cheque_no = fields.Char(string='Cheque Number', readonly=True)
+    amount = fields.Float(string='Amount', readonly=True)
+    deletion_date = fields.Datetime(string='Deletion Date', readonly=True, default=fields.Datetime.now)
+    payload = fields.Json(string='Snapshot', readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE SEQUENCE IF NOT EXISTS revert_cheque_archive_id_seq;
+            CREATE TABLE IF NOT EXISTS revert_cheque_archive (
+                id integer NOT NULL DEFAULT nextval('revert_cheque_archive_id_seq'),
+                original_cheque_id integer,
+                company_id integer,
+                name varchar,
+                cheque_no varchar,
+                amount double precision,
+                deletion_date timestamp without time zone NOT NULL,
+                payload jsonb NOT NULL,
+                PRIMARY KEY (id, deletion_date)
+            ) PARTITION BY RANGE (deletion_date);
+            CREATE INDEX IF NOT EXISTS revert_cheque_archive_original_cheque_id_index
+                ON revert_cheque_archive (original_cheque_id);
+            CREATE INDEX IF NOT EXISTS revert_cheque_archive_company_deletion_date_index
+                ON revert_cheque_archive (company_id, deletion_date);
+        """)
+        self._ensure_partitions([fields.Datetime.now()])
+
+    def _partition_name(self, month):
+        return f'{self._table}_y{month.year}m{month.month:02d}'
+
+    @api.model
+    def _ensure_partitions(self, datetimes):
+        """Create the monthly partitions holding ``datetimes``."""
+        for month in {_month_start(value) for value in datetimes}:
+            self.env.cr.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self._partition_name(month)}
+                PARTITION OF {self._table} FOR VALUES FROM (%s) TO (%s)
+            """, [month, _next_month(month)])
+
+    @api.model
+    def _drop_partitions_before(self, cutoff):
+        """Drop the monthly partitions holding only archives older than
+        ``cutoff`` and return how many were dropped."""
+        self.env.cr.execute("""
+            SELECT child.relname
+              FROM pg_inherits
+              JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+              JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+             WHERE parent.relname = %s
+        """, [self._table])
+        dropped = 0
+        for (partition,) in self.env.cr.fetchall():
+            year, month = partition.rsplit('_y', 1)[1].split('m')
+            if _next_month(date(int(year), int(month), 1)) <= cutoff.date():
+                self.env.cr.execute(f'DROP TABLE IF EXISTS {partition}')
+                dropped += 1
+        if dropped:
+            self.invalidate_model()
+        return dropped
+
+    @api.model
+    def _snapshot_cheques(self, cheques):
+        """Archive ``cheques`` with one multi-create of snapshots and return
+        them. The cheques themselves are left to the caller."""
+        now = fields.Datetime.now()
+        self._ensure_partitions([now])
+        field_names = [name for name in SNAPSHOT_FIELDS if name in cheques._fields]
+        vals_list = []
+        for cheque in cheques:
+            payload = {}
+            for field_name in field_names:
+                field = cheques._fields[field_name]
+                value = field.convert_to_write(cheque[field_name], cheque)
+                if field.type in ('one2many', 'many2many'):
+                    value = cheque[field_name].ids
+                elif field.type in ('date', 'datetime'):
+                    value = field.to_string(value)
+                payload[field_name] = value
+            vals_list.append({
+                'original_cheque_id': cheque.id,
+                'company_id': cheque.company_id.id if 'company_id' in cheques._fields else False,
+                'name': payload.get('name'),
+                'cheque_no': payload.get('cheque_no') or payload.get('cheque_number'),
+                'amount': payload.get('amount') or 0.0,
+                'deletion_date': now,
+                'payload': payload,
+            })
+        snapshots = self.create(vals_list)
+        self._detach_attachments(cheques)
+        return snapshots
+
+    @api.model
+    def _detach_attachments(self, records):
+        """Unlink the attachments of ``records`` from them, so deleting the
+        records does not delete the attachments kept in their snapshots."""
+        if 'cheq_attachment_ids' not in records._fields:
+            return
+        attachments = records.cheq_attachment_ids
+        attached = attachments.filtered(lambda attachment: attachment.res_model == records._name)
+        attachments.write({'cheque_id': False})
+        attached.write({'res_id': False})
+
+    @api.model
+    def _relink_attachments(self, cheques):
+        """Attach the attachments restored with ``cheques`` to them again."""
+        if 'cheq_attachment_ids' not in cheques._fields:
+            return
+        for cheque in cheques.filtered('cheq_attachment_ids'):
+            cheque.cheq_attachment_ids.filtered(lambda attachment: not attachment.res_id).write({
+                'res_model': cheque._name,
+                'res_id': cheque.id,
+            })
+
+    def _prepare_restore_vals_list(self):
+        ChequeManage = self.env['cheque.manage']
+        existing_line_ids = set(self.env['account.move.line'].browse(
+            {line_id for archive in self for line_id in archive.payload.get('move_line_ids', [])}).exists().ids)
+        existing_attachment_ids = set(self.env['ir.attachment'].browse(
+            {attachment_id for archive in self
+             for attachment_id in archive.payload.get('cheq_attachment_ids', [])}).exists().ids)
+        vals_list = []
+        for archive in self:
+            vals = {key: value for key, value in archive.payload.items() if key in ChequeManage._fields}
+            vals['state'] = 'draft'
+            if 'move_line_ids' in vals:
+                vals['move_line_ids'] = [(6, 0, [line_id for line_id in vals['move_line_ids']
+                                                 if line_id in existing_line_ids])]
+            if 'cheq_attachment_ids' in vals:
+                vals['cheq_attachment_ids'] = [(6, 0, [attachment_id for attachment_id in vals['cheq_attachment_ids']
+                                                       if attachment_id in existing_attachment_ids])]
+            vals_list.append(vals)
+        return vals_list
+
+    @profiled
+    def restore_cheque(self):
+        return self._restore_cheques()._action_open_restored()
+
+    def _restore_cheques(self):
+        """Recreate the archived cheques and delete the snapshots."""
+        restored_cheques = self.env['cheque.manage']._create_restored(self._prepare_restore_vals_list())
+        self.unlink()
+        return restored_cheques
+
+    @api.model
+    def _purge_expired(self, auto_commit=True):
+        """Drop the partitions older than the longest company retention, then
+        delete the remaining snapshots older than their company retention."""
+        started = time.monotonic()
+        now = fields.Datetime.now()
+        companies = self.env['res.company'].search([])
+        longest_retention = max(companies.mapped('cheque_archive_retention_days') or [0])
+        dropped = self._drop_partitions_before(now - timedelta(days=longest_retention))
+        deleted = 0
+        for company in companies:
+            cutoff = now - timedelta(days=company.cheque_archive_retention_days)
+            self.env.cr.execute(f"""
+                DELETE FROM {self._table}
+                 WHERE (company_id = %s OR (company_id IS NULL AND %s)) AND deletion_date < %s
+            """, [company.id, company == self.env.company, cutoff])
+            deleted += self.env.cr.rowcount
+        self.invalidate_model()
+        if auto_commit:
+            self.env.cr.commit()
+        _logger.info(
+            f"Dropped {dropped} archive partition(s) and deleted {deleted} snapshot(s) "
+            f"in {time.monotonic() - started:.2f}s.")
+        return deleted
+
+
+class ChequeManage(models.Model):
+    _inherit = 'cheque.manage'
+
+    @api.model
+    def _create_restored(self, vals_list):
+        """Recreate archived cheques with one multi-create, attach their
+        attachments again and post all their draft journal entries at once."""
+        restored_cheques = self.create(vals_list)
+        _logger.info(f"Cheques restored with new IDs: {restored_cheques.ids}")
+        self.env['revert.cheque.archive']._relink_attachments(restored_cheques)
+        if 'move_line_ids' in restored_cheques._fields:
+            draft_moves = restored_cheques.move_line_ids.move_id.filtered(lambda move: move.state == 'draft')
+            if draft_moves:
+                _logger.info(f"Posting journal entries with IDs: {draft_moves.ids} for restored cheques")
+                draft_moves.action_post()
+        return restored_cheques
+
+    def _action_open_restored(self):
+        if len(self) == 1:
+            return {
+                'type': 'ir.actions.act_window',
+                'name': 'Restored Cheque',
+                'res_model': self._name,
+                'view_mode': 'form',
+                'res_id': self.id,
+                'target': 'current',
+            }
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Restored Cheques',
+            'res_model': self._name,
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', self.ids)],
+            'target': 'current',
+        }
+
+    @profiled
+    def action_delete_to_snapshot(self):
+        """Delete the cheques after archiving them as compact snapshots."""
+        self.env['revert.cheque.archive']._snapshot_cheques(self)
+        self.unlink()
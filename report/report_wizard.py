@@ -18,8 +18,20 @@
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 ##############################################################################
+import base64
+import os
+import tempfile
+
+import xlsxwriter
+
 from odoo import api, fields, models
 
+from ..models.cheque_profile import profiled
+
+REPORT_FIELDS = ('seq_no', 'name', 'cheque_no', 'payer', 'bank_account', 'cheque_date', 'amount', 'state')
+REPORT_CHUNK_SIZE = 5000
+
+
 class ChequeReportWizard(models.TransientModel):
     _name = 'cheque.report.wizard'
     _description = 'Report Wizard'
@@ -37,31 +49,138 @@ class ChequeReportWizard(models.TransientModel):
         ('done', 'Done'),
         ('cancel', 'Cancelled'),
     ], string='Status')
-    
+    branch_id = fields.Many2one('branch.model', string='Branch')
+    include_sub_branches = fields.Boolean(string='Include Sub-Branches', default=True)
+    xlsx_file = fields.Binary(string='XLSX File', readonly=True, attachment=False)
+    xlsx_filename = fields.Char(string='XLSX File Name', readonly=True)
 
+    @profiled
     def print_report(self):
-        return self.env.ref('gt_cheque_management.action_cheque_manage_report_document').report_action(self)
-        
-        
- 
+        return self.env.ref('gt_cheque_management.action_cheque_report_stream').report_action(self)
+
+    @profiled
+    def print_xlsx(self):
+        self.ensure_one()
+        self.write({
+            'xlsx_file': base64.b64encode(self._render_xlsx()),
+            'xlsx_filename': 'cheque_report_%s.xlsx' % self.cheq_type,
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/?model=%s&id=%s&field=xlsx_file&filename_field=xlsx_filename&download=true'
+                   % (self._name, self.id),
+            'target': 'self',
+        }
+
+    @profiled
+    def enqueue_print_report(self):
+        return self._enqueue_report('pdf')
+
+    @profiled
+    def enqueue_print_xlsx(self):
+        return self._enqueue_report('xlsx')
+
+    def _enqueue_report(self, report_format):
+        self.ensure_one()
+        return self.env['cheque.job']._enqueue('report', self, {
+            'format': report_format,
+            'date_from': fields.Date.to_string(self.date_from),
+            'date_to': fields.Date.to_string(self.date_to),
+            'cheq_type': self.cheq_type,
+            'state': self.state,
+            'branch_id': self.branch_id.id,
+            'include_sub_branches': self.include_sub_branches,
+        })
+
+    def _render_xlsx(self, chunk_size=REPORT_CHUNK_SIZE):
+        """Write the report rows to an XLSX file and return its content.
+
+        The workbook is opened in xlsxwriter's ``constant_memory`` mode, which
+        flushes every row to disk once written, and rows come from
+        :meth:`stream_data`, so memory stays flat whatever the row count.
+        """
+        ChequeManage = self.env['cheque.manage']
+        state_labels = dict(ChequeManage._fields['state'].selection)
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            sheet = workbook.add_worksheet('Cheques')
+            header_format = workbook.add_format({'bold': True})
+            date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+            for col, field_name in enumerate(REPORT_FIELDS):
+                sheet.write(0, col, ChequeManage._fields[field_name].string, header_format)
+            for row, record in enumerate(self.stream_data(chunk_size=chunk_size), start=1):
+                for col, field_name in enumerate(REPORT_FIELDS):
+                    value = record[field_name]
+                    if value is False or value is None:
+                        continue
+                    if field_name == 'cheque_date':
+                        sheet.write_datetime(row, col, value, date_format)
+                    elif field_name == 'state':
+                        sheet.write_string(row, col, state_labels.get(value, value))
+                    elif isinstance(value, tuple):
+                        sheet.write_string(row, col, value[1])
+                    else:
+                        sheet.write(row, col, value)
+            workbook.close()
+            with open(path, 'rb') as xlsx:
+                return xlsx.read()
+        finally:
+            os.unlink(path)
+
+    def _prepare_cheque_domain(self):
+        self.ensure_one()
+        domain = [('cheq_type', '=', self.cheq_type)]
+        if self.date_from:
+            domain.append(('cheque_date', '>=', self.date_from))
+        if self.date_to:
+            domain.append(('cheque_date', '<=', self.date_to))
+        if self.state:
+            domain.append(('state', '=', self.state))
+        if self.branch_id:
+            branch_ids = self.branch_id.get_subtree_ids() if self.include_sub_branches else self.branch_id.ids
+            domain.append(('branch_id', 'in', branch_ids))
+        return domain
+
+    @profiled
     def print_data(self):
-        cheque_data=[]
-        if self.cheq_type=='incoming':
-            if self.date_from and self.state:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','incoming'),('cheque_date','>=',self.date_from),('cheque_date','<=',self.date_to),('state','=',self.state)])
-            elif self.date_from:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','incoming'),('cheque_date','>=',self.date_from),('cheque_date','<=',self.date_to)])
-            elif self.state:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','incoming'),('cheque_date','<=',self.date_to),('state','=',self.state)])
-            else:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','incoming'),('cheque_date','>=',self.date_to)])
-        else:
-            if self.date_from and self.state:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','outgoing'),('cheque_date','>=',self.date_from),('cheque_date','<=',self.date_to),('state','=',self.state)])
-            elif self.date_from:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','outgoing'),('cheque_date','>=',self.date_from),('cheque_date','<=',self.date_to)])
-            elif self.state:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','outgoing'),('cheque_date','<=',self.date_to),('state','=',self.state)])
-            else:
-                cheque_data=self.env['cheque.manage'].search([('cheq_type','=','outgoing'),('cheque_date','<=',self.date_to)])
-        return cheque_data
+        return self.env['cheque.manage'].search(self._prepare_cheque_domain())
+
+    def stream_data(self, field_names=REPORT_FIELDS, chunk_size=REPORT_CHUNK_SIZE):
+        """Yield the report rows as dictionaries holding only ``field_names``.
+
+        Rows are read in keyset-paginated chunks ordered by id and the cache
+        is dropped after each chunk, so memory does not grow with the number
+        of cheques in the report.
+        """
+        ChequeManage = self.env['cheque.manage']
+        domain = self._prepare_cheque_domain()
+        last_id = 0
+        while True:
+            rows = ChequeManage.search_read(domain + [('id', '>', last_id)], list(field_names),
+                                            order='id', limit=chunk_size)
+            if not rows:
+                break
+            yield from rows
+            last_id = rows[-1]['id']
+            ChequeManage.invalidate_model()
+
+    @profiled
+    def print_totals(self):
+        """Return the number and amount of cheques per state and per day,
+        aggregated by the database."""
+        ChequeManage = self.env['cheque.manage']
+        domain = self._prepare_cheque_domain()
+        state_labels = dict(self._fields['state'].selection)
+        by_state = [
+            {'state': state, 'label': state_labels.get(state, state), 'count': count, 'amount': amount}
+            for state, count, amount in ChequeManage._read_group(
+                domain, ['state'], ['__count', 'amount:sum'], order='state')
+        ]
+        by_day = [
+            {'date': day, 'count': count, 'amount': amount}
+            for day, count, amount in ChequeManage._read_group(
+                domain, ['cheque_date:day'], ['__count', 'amount:sum'], order='cheque_date:day')
+        ]
+        return {'by_state': by_state, 'by_day': by_day, 'state_labels': state_labels}
@@ -0,0 +1,5 @@
+from . import test_cheque_benchmark
+from . import test_leaf_generation
+from . import test_report_xlsx
+from . import test_restore
+from . import test_leaf_allocation
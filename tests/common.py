@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+# Scales are opt-in through the environment, e.g.
+#   CHEQUE_BENCHMARK_SCALES=1000,100000,1000000
+#   CHEQUE_BENCHMARK_OUTPUT=/tmp/cheque_benchmark.json
+# The XLSX export benchmark only runs with the cheque_benchmark_xlsx test tag.
+BENCHMARK_SCALES = tuple(
+    int(scale) for scale in os.environ.get('CHEQUE_BENCHMARK_SCALES', '1000').split(',') if scale.strip())
+XLSX_BENCHMARK_SCALES = tuple(
+    int(scale) for scale in os.environ.get('CHEQUE_BENCHMARK_XLSX_SCALES', '100000,1000000').split(',')
+    if scale.strip())
+BENCHMARK_OUTPUT = os.environ.get('CHEQUE_BENCHMARK_OUTPUT')
+LEAF_SCALE = 10000
+STATEMENT_SCALE = 50000
+LEAVES_PER_BOOK = 500
+BRANCH_COUNT = 10
+
+
+def _reset_peak_rss():
+    """Reset the peak resident set size of the process, where the kernel
+    allows it, and return whether it was reset."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    """Return the peak resident set size of the process in bytes."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def write_benchmark_results(results):
+    """Log the benchmark results and append them to ``BENCHMARK_OUTPUT``."""
+    _logger.info("Cheque benchmark results:\n%s", json.dumps(results, indent=2, default=str))
+    if BENCHMARK_OUTPUT:
+        with open(BENCHMARK_OUTPUT, 'a') as output:
+            for result in results:
+                output.write(json.dumps(result, default=str) + '\n')
+
+
+class ChequeBenchmarkCommon(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.benchmark_results = []
+        cls.bank = cls.env['res.bank'].create({'name': 'Benchmark Bank'})
+        cls.bank_account = cls.company_data['default_account_assets']
+        cls.journal = cls.company_data['default_journal_bank']
+        cls.branches = cls.env['branch.model'].create([
+            {'name': f'Branch {index}', 'code': f'BR{index}'} for index in range(BRANCH_COUNT)
+        ])
+        cls.category = cls.env['cheque.category'].create({
+            'name': 'Benchmark',
+            'debit_account': cls.company_data['default_account_receivable'].id,
+            'credit_account': cls.company_data['default_account_assets'].id,
+            'journal_id': cls.journal.id,
+        })
+
+    @classmethod
+    def tearDownClass(cls):
+        write_benchmark_results(cls.benchmark_results)
+        super().tearDownClass()
+
+    @contextmanager
+    def benchmark(self, name, scale, records=0):
+        """Record the query count, wall time, peak resident set size and peak
+        Python memory of the block and keep them in the machine-readable
+        results of the class.
+
+        ``peak_rss`` is the peak of the whole process. When the kernel does not
+        let the peak be reset, ``peak_rss_reset`` is false and the value may
+        come from an earlier block.
+        """
+        self.env.flush_all()
+        self.env.invalidate_all()
+        result = {'benchmark': name, 'scale': scale, 'records': records}
+        result['peak_rss_reset'] = _reset_peak_rss()
+        tracemalloc.start()
+        queries_before = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        try:
+            yield result
+            self.env.flush_all()
+        finally:
+            result['wall_time'] = round(time.perf_counter() - started, 4)
+            result['queries'] = self.env.cr.sql_log_count - queries_before
+            result['peak_python_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            result['peak_rss'] = _peak_rss()
+            self.benchmark_results.append(result)
+
+    def assertQueriesConstant(self, small_result, large_result, msg=None):
+        """Assert that the benchmark of the larger recordset ran no more
+        queries than the one of the smaller recordset."""
+        self.assertLessEqual(large_result['queries'], small_result['queries'], msg)
+
+    def create_books(self, cheque_count):
+        book_count = max(cheque_count // LEAVES_PER_BOOK, 1)
+        return self.env['cheque.book'].create([{
+            'name': f'Book {index}',
+            'bank_id': self.bank.id,
+            'account_id': self.bank_account.id,
+            'branch_id': self.branches[index % BRANCH_COUNT].id,
+            'start_number': index * LEAVES_PER_BOOK + 1,
+            'end_number': (index + 1) * LEAVES_PER_BOOK,
+        } for index in range(book_count)])
+
+    def create_cheques(self, cheque_count, cheq_type='incoming'):
+        books = self.create_books(cheque_count)
+        leaves = books._generate_leaves_batch()
+        today = fields.Date.today()
+        states = ('register', 'deposit', 'done', 'bounce')
+        for index, state in enumerate(states):
+            leaves[index::len(states)].write({
+                'state': state,
+                'cheq_type': cheq_type,
+                'cheque_date': today - timedelta(days=index),
+                'amount': 100.0 * (index + 1),
+            })
+        return books, leaves
+
+    def create_archives(self, count, deletion_date):
+        return self.env['revert.cheque'].create([{
+            'name': f'Archived {index}',
+            'cheque_no': str(index),
+            'amount': 100.0,
+            'cheq_type': 'incoming',
+            'state': 'bounce',
+            'company_id': self.env.company.id,
+            'deletion_date': deletion_date,
+        } for index in range(count)])
+
+    def create_payments(self, count, books, stage='deposited'):
+        return self.env['cheque.payment'].create([{
+            'name': f'Payment {index}',
+            'cheque_book_id': books[index % len(books)].id,
+            'recipient_id': self.partner_a.id,
+            'amount': 100.0,
+            'category_id': self.category.id,
+            'stage': stage,
+        } for index in range(count)])
@@ -0,0 +1,209 @@
+import random
+from datetime import date, datetime, timedelta
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.gt_cheque_management.wizard.cheque_statement_import import match_statement_lines
+from .common import BENCHMARK_SCALES, STATEMENT_SCALE, ChequeBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestChequeBenchmark(ChequeBenchmarkCommon):
+
+    def test_confirm_payments_allocates_cheques(self):
+        books = self.create_books(1)
+        books._generate_leaves_batch()
+        payments = self.create_payments(5, books, stage='draft')
+        payments.action_confirm_payment()
+        cheques = payments.cheque_id
+        self.assertEqual(len(cheques), 5, "every payment gets its own cheque")
+        self.assertEqual(sorted(cheques.mapped('cheque_number'), key=int), ['1', '2', '3', '4', '5'])
+        self.assertEqual(cheques.payment_ids, payments)
+
+    def test_confirm_payment_refuses_closed_payments(self):
+        books = self.create_books(1)
+        books._generate_leaves_batch()
+        payments = self.create_payments(3, books, stage='draft')
+        payments[1:].write({'stage': 'cleared'})
+        with self.assertRaises(UserError):
+            payments.action_confirm_payment()
+        self.assertFalse(payments.cheque_id, "nothing is confirmed when a payment is closed")
+
+    def test_book_list_read(self):
+        for scale in BENCHMARK_SCALES:
+            books, leaves = self.create_cheques(scale)
+            counter_fields = ['name', 'current_number', 'used_leaves', 'cancelled_leaves', 'remaining_leaves']
+            with self.benchmark('book_list_read', 1, 1) as small_result:
+                books[:1].read(counter_fields)
+            with self.benchmark('book_list_read', scale, len(books)) as large_result:
+                books.read(counter_fields)
+            self.assertQueriesConstant(small_result, large_result, "reading the book list must not depend on its size")
+            self.assertEqual(books[0].used_leaves, 500)
+            self.assertEqual(books[0].remaining_leaves, 0)
+
+    def test_report_data(self):
+        for scale in BENCHMARK_SCALES:
+            wizard = self.env['cheque.report.wizard'].create({
+                'date_from': fields.Date.today() - timedelta(days=30),
+                'cheq_type': 'incoming',
+            })
+            with self.benchmark('report_totals', 0, 0) as empty_result:
+                wizard.print_totals()
+            self.create_cheques(scale)
+            with self.benchmark('report_stream_data', scale, scale):
+                rows = sum(1 for _row in wizard.stream_data())
+            self.assertGreaterEqual(rows, scale)
+            with self.benchmark('report_totals', scale, scale) as result:
+                totals = wizard.print_totals()
+            self.assertQueriesConstant(empty_result, result, "totals must be aggregated by the database")
+            self.assertEqual(sum(group['count'] for group in totals['by_state']), rows)
+            self.assertEqual(sum(group['count'] for group in totals['by_day']), rows)
+
+    def _archive_partitions(self):
+        self.env.cr.execute("""
+            SELECT child.relname
+              FROM pg_inherits
+              JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+              JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+             WHERE parent.relname = 'revert_cheque_archive'
+        """)
+        return {partition for partition, in self.env.cr.fetchall()}
+
+    def test_snapshot_partitions(self):
+        Archive = self.env['revert.cheque.archive']
+        Archive._ensure_partitions([datetime(2020, 3, 15), datetime(2020, 4, 15)])
+        Archive._ensure_partitions([datetime(2020, 3, 31)])
+        partitions = self._archive_partitions()
+        self.assertIn('revert_cheque_archive_y2020m03', partitions)
+        self.assertIn('revert_cheque_archive_y2020m04', partitions)
+        # only the partitions ending before the cutoff are dropped
+        Archive._drop_partitions_before(datetime(2020, 4, 10))
+        partitions = self._archive_partitions()
+        self.assertNotIn('revert_cheque_archive_y2020m03', partitions)
+        self.assertIn('revert_cheque_archive_y2020m04', partitions)
+        Archive._drop_partitions_before(datetime(2020, 5, 1))
+        self.assertNotIn('revert_cheque_archive_y2020m04', self._archive_partitions())
+        self.assertIn(Archive._partition_name(fields.Datetime.now()), self._archive_partitions())
+
+    def test_snapshot_round_trip(self):
+        books = self.create_books(1)
+        cheques = books._generate_leaves_batch()[:3]
+        cheques.write({'state': 'register', 'amount': 150.0, 'cheque_date': fields.Date.today()})
+        attachment = self.env['ir.attachment'].create({
+            'name': 'cheque.pdf',
+            'raw': b'cheque',
+            'res_model': 'cheque.manage',
+            'res_id': cheques[0].id,
+            'cheque_id': cheques[0].id,
+        })
+        numbers = cheques.mapped('cheque_number')
+        cheque_ids = cheques.ids
+        cheques.action_delete_to_snapshot()
+        self.assertFalse(cheques.exists())
+        self.assertTrue(attachment.exists(), "archiving a cheque must keep its attachments")
+
+        snapshots = self.env['revert.cheque.archive'].search([('original_cheque_id', 'in', cheque_ids)])
+        self.assertEqual(len(snapshots), 3)
+        self.assertEqual(set(snapshots.mapped('amount')), {150.0})
+        restored_cheques = snapshots._restore_cheques()
+        self.assertFalse(snapshots.exists())
+        self.assertEqual(sorted(restored_cheques.mapped('cheque_number')), sorted(numbers))
+        self.assertEqual(set(restored_cheques.mapped('state')), {'draft'})
+        self.assertEqual(set(restored_cheques.mapped('amount')), {150.0})
+        first_cheque = restored_cheques.filtered(lambda cheque: cheque.cheque_number == numbers[0])
+        self.assertEqual(attachment.cheque_id, first_cheque)
+        self.assertEqual((attachment.res_model, attachment.res_id), ('cheque.manage', first_cheque.id))
+
+    def test_compact_archives_to_snapshots(self):
+        archives = self.create_archives(20, fields.Datetime.now())
+        compacted = self.env['revert.cheque']._cron_compact_to_snapshots(batch_size=7, auto_commit=False)
+        self.assertEqual(compacted, 20)
+        self.assertFalse(archives.exists())
+        snapshots = self.env['revert.cheque.archive'].search([('name', '=like', 'Archived %')])
+        self.assertEqual(len(snapshots), 20)
+        self.assertEqual(set(snapshots.mapped(lambda snapshot: snapshot.payload['state'])), {'bounce'})
+
+    def test_name_search_escapes_wildcards(self):
+        """Wildcards typed by the user match literally in the prefix and exact
+        code lookups."""
+        categories = self.env['cheque.category'].create([{'name': 'A_B'}, {'name': 'AXB'}])
+        self.assertEqual(self.env['cheque.category']._name_search('A_', limit=1), categories[:1].ids)
+        branches = self.env['branch.model'].create([
+            {'name': 'Percent', 'code': '1%'},
+            {'name': 'Other', 'code': '10'},
+        ])
+        self.assertEqual(self.env['branch.model']._name_search('1%', limit=1), branches[:1].ids)
+
+    def test_archive_purge(self):
+        for scale in BENCHMARK_SCALES:
+            self.create_archives(scale, fields.Datetime.now() - timedelta(days=30))
+            recent = self.create_archives(10, fields.Datetime.now())
+            with self.benchmark('archive_purge', scale, scale):
+                deleted = self.env['revert.cheque'].delete_old_archives(auto_commit=False, time_limit=0)
+            self.assertEqual(deleted, scale)
+            self.assertTrue(recent.exists())
+
+    def test_archive_purge_time_limit(self):
+        """A run reaching its time limit stops after the current batch and
+        leaves the snapshots to the next run."""
+        self.env.company.cheque_archive_purge_batch_size = 10
+        self.create_archives(30, fields.Datetime.now() - timedelta(days=30))
+        Archive = self.env['revert.cheque.archive']
+        old_date = fields.Datetime.now() - timedelta(days=30)
+        Archive._ensure_partitions([old_date])
+        snapshot = Archive.create({'name': 'Old snapshot', 'deletion_date': old_date, 'payload': {}})
+        deleted = self.env['revert.cheque'].delete_old_archives(auto_commit=False, time_limit=1e-9)
+        self.assertEqual(deleted, 10)
+        self.assertTrue(snapshot.exists())
+
+    def test_payment_clearing(self):
+        for scale in BENCHMARK_SCALES:
+            books = self.create_books(scale)
+            payments = self.create_payments(scale, books)
+            with self.benchmark('payment_clearing', scale, scale):
+                moves = payments._clear_cheques()
+            self.assertEqual(len(moves), scale)
+            self.assertEqual(set(payments.mapped('stage')), {'cleared'})
+            payments = self.create_payments(scale, books)
+            with self.benchmark('payment_clearing_combined', scale, scale):
+                moves = payments._clear_cheques(combine=True)
+            self.assertEqual(len(moves), 1)
+
+    def test_statement_matching_conflicting_numbers(self):
+        """A line and a payment carrying different cheque numbers never match,
+        even when amount and date agree."""
+        day = date(2024, 1, 2)
+        self.assertFalse(match_statement_lines([(0, '123', 100.0, day)], [(1, '999', 100.0, day)]))
+        self.assertEqual(match_statement_lines([(0, '123', 100.0, day)], [(1, None, 100.0, day)]), {1: (0, '123', 100.0, day)})
+        self.assertEqual(match_statement_lines([(0, None, 100.0, day)], [(1, '999', 100.0, day)]), {1: (0, None, 100.0, day)})
+
+    def test_statement_matching(self):
+        for scale in BENCHMARK_SCALES + (STATEMENT_SCALE,):
+            rng = random.Random(scale)
+            start = date(2024, 1, 1)
+            payments = [
+                (index, str(100000 + index), rng.randint(100, 10 ** 6) / 100.0,
+                 start + timedelta(days=rng.randint(0, 60)))
+                for index in range(scale)
+            ]
+            lines = [
+                (index, payment[1] if index % 2 else None, payment[2], payment[3] + timedelta(days=rng.randint(-2, 2)))
+                for index, payment in enumerate(payments)
+            ]
+            # lines of other cheques sharing the amount and date of a payment
+            conflicting = [
+                (scale + index, str(900000 + index), payment[2], payment[3])
+                for index, payment in enumerate(payments[:scale // 10])
+            ]
+            with self.benchmark('statement_matching', scale, scale + len(conflicting)) as result:
+                matches = match_statement_lines(lines + conflicting, payments)
+            self.assertEqual(result['queries'], 0)
+            self.assertGreaterEqual(len(matches), scale * 0.99)
+            self.assertFalse([line for line in matches.values() if line[0] >= scale],
+                             "lines with another cheque number must not be matched")
+            for payment_id, line in matches.items():
+                if line[1]:
+                    self.assertEqual(line[1], payments[payment_id][1])
+
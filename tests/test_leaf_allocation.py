@@ -0,0 +1,112 @@
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api
+from odoo.exceptions import UserError
+from odoo.modules.registry import Registry
+from odoo.tests import BaseCase, get_db_name, tagged
+
+from .common import ChequeBenchmarkCommon, write_benchmark_results
+
+ALLOCATOR_THREADS = 8
+ALLOCATIONS_PER_THREAD = 50
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestLeafAllocation(ChequeBenchmarkCommon):
+
+    def test_allocate_leaves_numeric_order(self):
+        book = self.create_books(1)
+        book.write({'start_number': 8, 'end_number': 12})
+        book._generate_leaves_batch()
+        self.assertEqual(book._allocate_leaves(3).mapped('cheque_number'), ['8', '9', '10'])
+
+    def test_confirm_payment_refuses_taken_cheque(self):
+        """A leaf picked by hand and issued meanwhile by another cashier is
+        refused instead of being issued twice."""
+        books = self.create_books(1)
+        books.write({'start_number': 1, 'end_number': 10})
+        leaf = books._generate_leaves_batch()[:1]
+        payment = self.create_payments(1, books, stage='draft')
+        payment.cheque_id = leaf
+        self.env.flush_all()
+        # another transaction issued the leaf after the payment was saved
+        self.env.cr.execute("UPDATE cheque_manage SET state = 'register' WHERE id = %s", [leaf.id])
+        with self.assertRaises(UserError):
+            payment.action_confirm_payment()
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestChequeAllocatorContention(BaseCase):
+    """Cashiers issuing leaves of the same book at the same time, each thread
+    in its own committed transactions. The data has to be committed for the
+    threads to see it, so the test creates and removes it itself."""
+
+    def setUp(self):
+        super().setUp()
+        self.registry = Registry(get_db_name())
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            bank = env['res.bank'].create({'name': 'Contention Bank'})
+            book = env['cheque.book'].create({
+                'name': 'Contention Book',
+                'bank_id': bank.id,
+                'account_id': env['account.account'].search([('company_id', '=', env.company.id)], limit=1).id,
+                'start_number': 1,
+                'end_number': (ALLOCATOR_THREADS + 1) * ALLOCATIONS_PER_THREAD,
+            })
+            book._generate_leaves_batch()
+            self.bank_id, self.book_id = bank.id, book.id
+            self.cron_id = env.ref('gt_cheque_management.ir_cron_cheque_book_counters').id
+            cr.execute("SELECT COALESCE(MAX(id), 0) FROM ir_cron_trigger")
+            self.last_trigger_id = cr.fetchone()[0]
+        self.addCleanup(self._remove_book)
+
+    def _remove_book(self):
+        with self.registry.cursor() as cr:
+            # the allocations triggered the counter cron, drop those triggers
+            cr.execute("DELETE FROM ir_cron_trigger WHERE cron_id = %s AND id > %s",
+                       [self.cron_id, self.last_trigger_id])
+            cr.execute("DELETE FROM cheque_manage WHERE cheque_book_id = %s", [self.book_id])
+            cr.execute("DELETE FROM cheque_book WHERE id = %s", [self.book_id])
+            cr.execute("DELETE FROM res_bank WHERE id = %s", [self.bank_id])
+
+    def _allocate(self, thread_count):
+        """Let ``thread_count`` threads allocate leaves one transaction at a
+        time and return the allocated leaf ids, the errors and the time."""
+        allocated_ids, errors = [], []
+
+        def cashier():
+            try:
+                for _index in range(ALLOCATIONS_PER_THREAD):
+                    with self.registry.cursor() as cr:
+                        env = api.Environment(cr, SUPERUSER_ID, {})
+                        allocated_ids.extend(env['cheque.book'].browse(self.book_id)._allocate_leaves().ids)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=cashier) for _index in range(thread_count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return allocated_ids, errors, time.perf_counter() - started
+
+    def test_allocator_contention(self):
+        results = []
+        all_ids = []
+        for thread_count in (1, ALLOCATOR_THREADS):
+            allocated_ids, errors, elapsed = self._allocate(thread_count)
+            self.assertFalse(errors, "concurrent allocations must neither fail nor retry")
+            self.assertEqual(len(allocated_ids), thread_count * ALLOCATIONS_PER_THREAD)
+            all_ids += allocated_ids
+            results.append({
+                'benchmark': 'allocator_contention',
+                'scale': thread_count,
+                'records': len(allocated_ids),
+                'wall_time': round(elapsed, 4),
+                'allocations_per_second': round(len(allocated_ids) / elapsed) if elapsed else None,
+            })
+        self.assertEqual(len(all_ids), len(set(all_ids)), "a leaf must never be allocated twice")
+        write_benchmark_results(results)
@@ -0,0 +1,21 @@
+from odoo.tests import tagged
+
+from .common import BENCHMARK_SCALES, LEAF_SCALE, ChequeBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestLeafGeneration(ChequeBenchmarkCommon):
+
+    def test_generate_leaves(self):
+        for scale in sorted(set(BENCHMARK_SCALES + (LEAF_SCALE,))):
+            books = self.create_books(scale)
+            with self.benchmark('generate_leaves', scale, scale) as result:
+                leaves = books._generate_leaves_batch()
+            self.assertEqual(len(leaves), len(books) * 500)
+            result['books'] = len(books)
+            # generating again reads the existing leaves of all books at once
+            with self.benchmark('generate_leaves_again', 1, 0) as small_result:
+                self.assertFalse(books[:1]._generate_leaves_batch())
+            with self.benchmark('generate_leaves_again', len(books), 0) as large_result:
+                self.assertFalse(books._generate_leaves_batch())
+            self.assertQueriesConstant(small_result, large_result)
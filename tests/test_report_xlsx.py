@@ -0,0 +1,48 @@
+import io
+
+import openpyxl
+
+from odoo.tests import tagged
+
+from .common import BENCHMARK_SCALES, XLSX_BENCHMARK_SCALES, ChequeBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestReportXlsx(ChequeBenchmarkCommon):
+
+    def test_report_xlsx(self):
+        for scale in BENCHMARK_SCALES:
+            self.create_cheques(scale)
+            wizard = self.env['cheque.report.wizard'].create({'cheq_type': 'incoming'})
+            with self.benchmark('report_xlsx', scale, scale) as result:
+                content = wizard._render_xlsx()
+            result['rows_per_second'] = round(scale / result['wall_time']) if result['wall_time'] else None
+            self.assertTrue(content.startswith(b'PK'))
+
+    def test_report_xlsx_empty_values(self):
+        """Empty values leave their cell blank instead of failing the export."""
+        books, leaves = self.create_cheques(1000)
+        leaves[:1].write({'cheque_date': False, 'amount': 0.0})
+        wizard = self.env['cheque.report.wizard'].create({'cheq_type': 'incoming'})
+        sheet = openpyxl.load_workbook(io.BytesIO(wizard._render_xlsx()), read_only=True).active
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        self.assertEqual(len(rows), len(leaves))
+        self.assertIn(None, [row[5] for row in rows], "a cheque without date must leave its date cell blank")
+        self.assertNotIn(False, [value for row in rows for value in row])
+
+
+@tagged('post_install', '-at_install', '-standard', 'cheque_benchmark_xlsx')
+class TestChequeXlsxBenchmark(ChequeBenchmarkCommon):
+
+    def test_report_xlsx_throughput(self):
+        """Rows per second and peak RSS of the XLSX export at large scales."""
+        created = 0
+        for scale in sorted(XLSX_BENCHMARK_SCALES):
+            self.create_cheques(scale - created)
+            created = scale
+            wizard = self.env['cheque.report.wizard'].create({'cheq_type': 'incoming'})
+            with self.benchmark('report_xlsx_throughput', scale, scale) as result:
+                content = wizard._render_xlsx()
+            result['rows_per_second'] = round(scale / result['wall_time']) if result['wall_time'] else None
+            result['file_size'] = len(content)
+            self.assertTrue(content.startswith(b'PK'))
@@ -0,0 +1,27 @@
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import BENCHMARK_SCALES, ChequeBenchmarkCommon
+
+
+@tagged('post_install', '-at_install', 'cheque_benchmark')
+class TestRestore(ChequeBenchmarkCommon):
+
+    def test_restore(self):
+        for scale in BENCHMARK_SCALES:
+            archives = self.create_archives(scale, fields.Datetime.now())
+            with self.benchmark('restore', scale, scale):
+                restored_cheques = archives._restore_cheques()
+            self.assertEqual(len(restored_cheques), scale)
+            self.assertFalse(archives.exists())
+
+    def test_restore_query_count(self):
+        """Restoring more cheques must not cost one query per cheque."""
+        small = self.create_archives(10, fields.Datetime.now())
+        large = self.create_archives(100, fields.Datetime.now())
+        with self.benchmark('restore', 10, 10) as small_result:
+            small._restore_cheques()
+        with self.benchmark('restore', 100, 100) as large_result:
+            large._restore_cheques()
+        self.assertEqual(large_result['queries'] - small_result['queries'], 0,
+                         "restoring 100 archives must run as many queries as restoring 10")
@@ -0,0 +1,318 @@
+import base64
+import csv
+import io
+import time
+from datetime import date, datetime
+
+import openpyxl
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MODELS = {
+    'cheque': 'cheque.manage',
+    'book': 'cheque.book',
+    'payment': 'cheque.payment',
+}
+IMPORT_COLUMNS = {
+    'cheque': ('book', 'cheque_number', 'partner', 'bank', 'account', 'branch',
+               'amount', 'cheque_date', 'cheq_type', 'state'),
+    'book': ('book', 'bank', 'account', 'branch', 'start_number', 'end_number'),
+    'payment': ('name', 'book', 'cheque_number', 'partner', 'amount', 'date', 'journal', 'category', 'stage'),
+}
+REQUIRED_COLUMNS = {
+    'cheque': {'book', 'cheque_number'},
+    'book': {'book', 'bank', 'account', 'start_number', 'end_number'},
+    'payment': {'name', 'book', 'partner'},
+}
+
+
+class ChequeRegisterImport(models.TransientModel):
+    _name = 'cheque.register.import'
+    _description = 'Cheque Register Import'
+
+    import_type = fields.Selection([
+        ('cheque', 'Cheques'),
+        ('book', 'Cheque Books'),
+        ('payment', 'Payments'),
+    ], string='Import', required=True, default='cheque')
+    import_file = fields.Binary(string='File', required=True)
+    filename = fields.Char(string='File Name')
+    file_type = fields.Selection([('csv', 'CSV'), ('xlsx', 'XLSX')], string='File Type',
+                                 required=True, default='csv')
+    batch_size = fields.Integer(string='Batch Size', default=IMPORT_BATCH_SIZE)
+    imported_count = fields.Integer(string='Imported Rows', readonly=True)
+    duplicate_count = fields.Integer(string='Duplicate Rows', readonly=True)
+    rejected_count = fields.Integer(string='Rejected Rows', readonly=True)
+    rows_per_second = fields.Float(string='Rows per Second', readonly=True)
+    rejected_file = fields.Binary(string='Rejected Rows File', readonly=True, attachment=False)
+    rejected_filename = fields.Char(string='Rejected Rows File Name', readonly=True)
+
+    @api.onchange('filename')
+    def _onchange_filename(self):
+        if self.filename and self.filename.lower().endswith(('.xlsx', '.xlsm')):
+            self.file_type = 'xlsx'
+        elif self.filename:
+            self.file_type = 'csv'
+
+    def _iter_rows(self):
+        """Yield the rows of the file as dictionaries keyed by lowercase
+        column header, without loading the whole sheet in memory."""
+        content = base64.b64decode(self.import_file)
+        if self.file_type == 'xlsx':
+            workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+            rows = workbook.active.iter_rows(values_only=True)
+        else:
+            rows = csv.reader(io.StringIO(content.decode('utf-8-sig')))
+        header = next(rows, None)
+        if not header:
+            raise UserError(_('The file is empty.'))
+        header = [str(column or '').strip().lower() for column in header]
+        missing = REQUIRED_COLUMNS[self.import_type] - set(header)
+        if missing:
+            raise UserError(_('Missing columns in the file: %s', ', '.join(sorted(missing))))
+        for row in rows:
+            yield dict(zip(header, row))
+
+    def _load_code_maps(self):
+        """Preload the ``code -> id`` dictionaries used to resolve the rows."""
+        def code_map(model, code_field, domain=()):
+            return {
+                str(record[code_field]).strip(): record['id']
+                for record in self.env[model].with_context(active_test=False).search_read(
+                    list(domain) + [(code_field, '!=', False)], [code_field])
+            }
+        return {
+            'book': code_map('cheque.book', 'name'),
+            'partner': code_map('res.partner', 'ref'),
+            'bank': code_map('res.bank', 'bic'),
+            'account': code_map('account.account', 'code', [('company_id', '=', self.env.company.id)]),
+            'branch': code_map('branch.model', 'code'),
+            'journal': code_map('account.journal', 'code', [('company_id', '=', self.env.company.id)]),
+            'category': code_map('cheque.category', 'complete_name'),
+        }
+
+    def _existing_numbers(self, book_id):
+        return {
+            leaf['cheque_number']
+            for leaf in self.env['cheque.manage'].search_read([('cheque_book_id', '=', book_id)], ['cheque_number'])
+        }
+
+    def _book_leaves(self, book_id):
+        """Return the ``cheque number -> leaf id`` dictionary of a book."""
+        return {
+            leaf['cheque_number']: leaf['id']
+            for leaf in self.env['cheque.manage'].search_read([('cheque_book_id', '=', book_id)], ['cheque_number'])
+        }
+
+    def _existing_payment_keys(self, book_id):
+        return {
+            payment['cheque_id'][0] if payment['cheque_id'] else payment['name']
+            for payment in self.env['cheque.payment'].search_read([('cheque_book_id', '=', book_id)],
+                                                                  ['name', 'cheque_id'])
+        }
+
+    @staticmethod
+    def _parse_date(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date) or not value:
+            return value or False
+        return fields.Date.to_date(str(value).strip()[:10])
+
+    @staticmethod
+    def _parse_number(value):
+        number = str(value or '').strip()
+        return number[:-2] if number.endswith('.0') else number
+
+    def _parse_selection(self, model, field_name, value, default):
+        """Return ``value`` as a key of the selection field, or raise
+        ``ValueError`` when it is not one."""
+        value = str(value or default).strip().lower()
+        if value not in self.env[model]._fields[field_name].get_values(self.env):
+            raise ValueError(_('Invalid %(field)s %(value)s', field=field_name, value=value))
+        return value
+
+    def _resolve_codes(self, vals, row, code_maps, columns):
+        """Set the ids of the ``column -> field`` codes of ``row`` in ``vals``."""
+        for column, field_name in columns:
+            code = str(row.get(column) or '').strip()
+            if code:
+                if code not in code_maps[column]:
+                    raise ValueError(_('Unknown %(column)s %(code)s', column=column, code=code))
+                vals[field_name] = code_maps[column][code]
+
+    def _prepare_cheque_vals(self, row, code_maps, used):
+        """Return the values of the cheque to create for ``row``, ``None`` for
+        a duplicate, or raise ``ValueError`` with the rejection reason."""
+        book_id = code_maps['book'].get(str(row.get('book') or '').strip())
+        if not book_id:
+            raise ValueError(_('Unknown cheque book %s', row.get('book')))
+        number = self._parse_number(row.get('cheque_number'))
+        if not number:
+            raise ValueError(_('Missing cheque number'))
+        if book_id not in used:
+            used[book_id] = self._existing_numbers(book_id)
+        if number in used[book_id]:
+            return None
+        vals = {
+            'cheque_book_id': book_id,
+            'cheque_number': number,
+            'amount': float(row.get('amount') or 0.0),
+            'cheque_date': self._parse_date(row.get('cheque_date')),
+            'cheq_type': self._parse_selection('cheque.manage', 'cheq_type', row.get('cheq_type'), 'incoming'),
+            'state': self._parse_selection('cheque.manage', 'state', row.get('state'), 'draft'),
+        }
+        self._resolve_codes(vals, row, code_maps, (('partner', 'payer'), ('bank', 'bank_id'),
+                                                   ('account', 'account_id'), ('branch', 'branch_id')))
+        used[book_id].add(number)
+        return vals
+
+    def _prepare_book_vals(self, row, code_maps, used):
+        """Return the values of the cheque book to create for ``row``, ``None``
+        for a duplicate, or raise ``ValueError`` with the rejection reason."""
+        name = str(row.get('book') or '').strip()
+        if not name:
+            raise ValueError(_('Missing cheque book'))
+        if name in code_maps['book'] or name in used:
+            return None
+        start_number = int(float(row.get('start_number') or 0))
+        end_number = int(float(row.get('end_number') or 0))
+        if not start_number or start_number >= end_number:
+            raise ValueError(_('Start number must be less than end number'))
+        vals = {
+            'name': name,
+            'start_number': start_number,
+            'end_number': end_number,
+        }
+        self._resolve_codes(vals, row, code_maps, (('bank', 'bank_id'), ('account', 'account_id'),
+                                                   ('branch', 'branch_id')))
+        if not vals.get('bank_id') or not vals.get('account_id'):
+            raise ValueError(_('Missing bank or account'))
+        used.add(name)
+        return vals
+
+    def _prepare_payment_vals(self, row, code_maps, used):
+        """Return the values of the payment to create for ``row``, ``None`` for
+        a duplicate, or raise ``ValueError`` with the rejection reason.
+        Payments are deduplicated on their cheque, or on their name when they
+        have no cheque number."""
+        book_id = code_maps['book'].get(str(row.get('book') or '').strip())
+        if not book_id:
+            raise ValueError(_('Unknown cheque book %s', row.get('book')))
+        name = str(row.get('name') or '').strip()
+        if not name:
+            raise ValueError(_('Missing payment name'))
+        if book_id not in used:
+            used[book_id] = (self._book_leaves(book_id), self._existing_payment_keys(book_id))
+        leaves, payment_keys = used[book_id]
+        number = self._parse_number(row.get('cheque_number'))
+        if number and number not in leaves:
+            raise ValueError(_('Unknown cheque number %s', number))
+        key = leaves[number] if number else name
+        if key in payment_keys:
+            return None
+        vals = {
+            'name': name,
+            'cheque_book_id': book_id,
+            'cheque_id': leaves.get(number, False),
+            'amount': float(row.get('amount') or 0.0),
+            'stage': self._parse_selection('cheque.payment', 'stage', row.get('stage'), 'draft'),
+        }
+        payment_date = self._parse_date(row.get('date'))
+        if payment_date:
+            vals['date'] = payment_date
+        self._resolve_codes(vals, row, code_maps, (('partner', 'recipient_id'), ('journal', 'journal_id'),
+                                                   ('category', 'category_id')))
+        if not vals.get('recipient_id'):
+            raise ValueError(_('Missing partner'))
+        if not vals.get('journal_id') and not vals.get('category_id'):
+            raise ValueError(_('Missing journal or category'))
+        payment_keys.add(key)
+        return vals
+
+    def _create_batch(self, vals_list, deferred_book_ids):
+        """Create a batch of records without recomputing the cheque book
+        counters; the ids of the books to recompute are added to
+        ``deferred_book_ids``."""
+        records = self.env[IMPORT_MODELS[self.import_type]].with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_notrack=True, defer_aging_summary=True,
+        ).create(vals_list)
+        if self.import_type == 'cheque':
+            books = records.cheque_book_id
+            for field in books._leaf_counter_fields():
+                self.env.remove_to_compute(field, books)
+            deferred_book_ids.update(books.ids)
+        # write the batch and drop it from the cache to keep memory flat
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+    def _recompute_deferred(self, deferred_book_ids):
+        """Recompute once what the batches left out: the counters of the
+        books that got leaves and the aging summary."""
+        if not deferred_book_ids:
+            return
+        books = self.env['cheque.book'].browse(sorted(deferred_book_ids))
+        for field in books._leaf_counter_fields():
+            self.env.add_to_compute(field, books)
+        self.env['cheque.aging.summary']._rebuild()
+        self.env.flush_all()
+
+    def action_import(self):
+        self.ensure_one()
+        started = time.monotonic()
+        batch_size = self.batch_size or IMPORT_BATCH_SIZE
+        code_maps = self._load_code_maps()
+        prepare_vals = getattr(self, '_prepare_%s_vals' % self.import_type)
+        used = set() if self.import_type == 'book' else {}
+        deferred_book_ids = set()
+        vals_list, rejected = [], []
+        imported = duplicates = 0
+        for line_number, row in enumerate(self._iter_rows(), start=2):
+            try:
+                vals = prepare_vals(row, code_maps, used)
+            except ValueError as error:
+                rejected.append((line_number, str(error), row))
+                continue
+            if vals is None:
+                duplicates += 1
+                continue
+            vals_list.append(vals)
+            if len(vals_list) >= batch_size:
+                self._create_batch(vals_list, deferred_book_ids)
+                imported += len(vals_list)
+                vals_list = []
+        if vals_list:
+            self._create_batch(vals_list, deferred_book_ids)
+            imported += len(vals_list)
+        self._recompute_deferred(deferred_book_ids)
+
+        elapsed = time.monotonic() - started
+        values = {
+            'imported_count': imported,
+            'duplicate_count': duplicates,
+            'rejected_count': len(rejected),
+            'rows_per_second': (imported + duplicates + len(rejected)) / elapsed if elapsed else 0.0,
+            'rejected_file': False,
+            'rejected_filename': False,
+        }
+        if rejected:
+            columns = IMPORT_COLUMNS[self.import_type]
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(('line', 'reason') + columns)
+            for line_number, reason, row in rejected:
+                writer.writerow((line_number, reason) + tuple(row.get(column) for column in columns))
+            values.update({
+                'rejected_file': base64.b64encode(output.getvalue().encode()),
+                'rejected_filename': 'rejected_rows.csv',
+            })
+        self.write(values)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
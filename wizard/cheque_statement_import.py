@@ -0,0 +1,170 @@
+import base64
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import datetime
+from xml.etree import ElementTree
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def _amount_key(amount):
+    return round(abs(amount) * 100)
+
+
+def _number_key(number):
+    number = str(number).strip() if number is not None and number is not False else ''
+    return number or None
+
+
+def match_statement_lines(lines, payments, date_window=3):
+    """Match statement lines against deposited payments with hash joins.
+
+    ``lines`` and ``payments`` are iterables of ``(key, cheque_number,
+    amount, date)`` tuples. Lines are first matched on ``(cheque_number,
+    amount)``, the remaining ones on the amount within ``date_window`` days
+    of the payment date. The amount/date fallback never pairs a line and a
+    payment that both carry a cheque number, since differing numbers mean
+    different cheques. Each payment is matched at most once.
+
+    Return a ``{payment_key: line}`` dictionary.
+    """
+    by_number = defaultdict(list)
+    by_amount_date = defaultdict(list)
+    for payment in payments:
+        key, number, amount, date = payment
+        number = _number_key(number)
+        if number:
+            by_number[(number, _amount_key(amount))].append(payment)
+        by_amount_date[(_amount_key(amount), date.toordinal() // (date_window + 1))].append(payment)
+
+    matches = {}
+    unmatched = []
+    for line in lines:
+        number, amount = _number_key(line[1]), line[2]
+        candidates = by_number.get((number, _amount_key(amount))) if number else None
+        while candidates:
+            payment = candidates.pop()
+            if payment[0] not in matches:
+                matches[payment[0]] = line
+                break
+        else:
+            unmatched.append(line)
+
+    for line in unmatched:
+        number = _number_key(line[1])
+        amount, ordinal = _amount_key(line[2]), line[3].toordinal()
+        bucket = ordinal // (date_window + 1)
+        for key in ((amount, bucket - 1), (amount, bucket), (amount, bucket + 1)):
+            candidates = by_amount_date.get(key, ())
+            payment = next((payment for payment in candidates if payment[0] not in matches
+                            and not (number and _number_key(payment[1]))
+                            and abs(payment[3].toordinal() - ordinal) <= date_window), None)
+            if payment:
+                matches[payment[0]] = line
+                break
+    return matches
+
+
+class ChequeStatementImport(models.TransientModel):
+    _name = 'cheque.statement.import'
+    _description = 'Cheque Bank Statement Import'
+
+    statement_file = fields.Binary(string='Statement File', required=True)
+    filename = fields.Char(string='File Name')
+    file_type = fields.Selection([
+        ('csv', 'CSV'),
+        ('camt', 'CAMT.053'),
+        ('ofx', 'OFX'),
+    ], string='File Type', required=True, default='csv')
+    date_window = fields.Integer(string='Date Window (Days)', default=3)
+    journal_id = fields.Many2one('account.journal', string='Journal')
+    matched_count = fields.Integer(string='Matched Cheques', readonly=True)
+    unmatched_count = fields.Integer(string='Unmatched Lines', readonly=True)
+
+    @api.onchange('filename')
+    def _onchange_filename(self):
+        if self.filename:
+            extension = self.filename.rsplit('.', 1)[-1].lower()
+            if extension in ('csv', 'ofx'):
+                self.file_type = extension
+            elif extension == 'xml':
+                self.file_type = 'camt'
+
+    def _parse_csv(self, content):
+        reader = csv.DictReader(io.StringIO(content.decode('utf-8-sig')))
+        for row in reader:
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            if not row.get('amount') or not row.get('date'):
+                continue
+            yield (row.get('cheque_number') or row.get('reference'),
+                   float(row['amount']), fields.Date.to_date(row['date']))
+
+    def _parse_camt(self, content):
+        for _event, element in ElementTree.iterparse(io.BytesIO(content)):
+            if element.tag.rsplit('}', 1)[-1] != 'Ntry':
+                continue
+            values = {child.tag.rsplit('}', 1)[-1]: child for child in element.iter()}
+            if 'Amt' in values and 'Dt' in values:
+                number = values.get('ChqNb')
+                yield (number.text if number is not None else None,
+                       float(values['Amt'].text), fields.Date.to_date(values['Dt'].text[:10]))
+            element.clear()
+
+    def _parse_ofx(self, content):
+        for transaction in OFX_TRANSACTION.finditer(content.decode('latin-1')):
+            values = {tag.upper(): value.strip() for tag, value in OFX_TAG.findall(transaction.group(1))}
+            if values.get('TRNAMT') and values.get('DTPOSTED'):
+                yield (values.get('CHECKNUM'), float(values['TRNAMT']),
+                       datetime.strptime(values['DTPOSTED'][:8], '%Y%m%d').date())
+
+    def _read_statement_lines(self):
+        self.ensure_one()
+        content = base64.b64decode(self.statement_file)
+        try:
+            parser = getattr(self, '_parse_%s' % self.file_type)
+            return [(index,) + line for index, line in enumerate(parser(content))]
+        except (ValueError, ElementTree.ParseError) as error:
+            raise UserError(_('The statement file could not be read: %s', error))
+
+    def _read_deposited_payments(self):
+        domain = [('stage', '=', 'deposited')]
+        if self.journal_id:
+            domain.append(('journal_id', '=', self.journal_id.id))
+        payments = self.env['cheque.payment'].search_read(domain, ['amount', 'date', 'cheque_id'])
+        cheque_numbers = {
+            cheque['id']: cheque['cheque_number']
+            for cheque in self.env['cheque.manage'].search_read(
+                [('id', 'in', [payment['cheque_id'][0] for payment in payments if payment['cheque_id']])],
+                ['cheque_number'])
+        }
+        return [
+            (payment['id'],
+             cheque_numbers.get(payment['cheque_id'][0]) if payment['cheque_id'] else None,
+             payment['amount'], payment['date'])
+            for payment in payments
+        ]
+
+    def action_import(self):
+        self.ensure_one()
+        lines = self._read_statement_lines()
+        matches = match_statement_lines(lines, self._read_deposited_payments(),
+                                        date_window=self.date_window)
+        payments = self.env['cheque.payment'].browse(list(matches))
+        payments._clear_cheques(clearing_dates={payment_id: line[3] for payment_id, line in matches.items()})
+        self.write({
+            'matched_count': len(matches),
+            'unmatched_count': len(lines) - len(matches),
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }